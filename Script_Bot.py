@@ -1,12 +1,19 @@
+import argparse
+import asyncio
+import heapq
 import os
+import threading
 import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-import gspread
-from google.oauth2.service_account import Credentials
 import pandas as pd
 import pytz
-import requests
 import config
+import metrics
+from outbox import OutboxJournal
+from storage import KEY_COLS, PLANNING_COLS, open_store
+from telegram_client import FileIdCache, RateLimiter, TelegramClient
 
 # ======================
 # Helpers / Parameters
@@ -25,157 +32,286 @@ if not TELEGRAM_TOKEN:
 TELEGRAM_TIMEOUT = getattr(config, "TELEGRAM_TIMEOUT", 10)  # seconds
 TELEGRAM_MAX_RETRIES = getattr(config, "TELEGRAM_MAX_RETRIES", 3)
 SEND_WINDOW_MINUTES = getattr(config, "SEND_WINDOW_MINUTES", None)  # None = pas de fenêtre
-
-API_BASE = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}"
-
-def col_idx_to_a1(idx1):
-    # idx1 is 1-based index -> column letters (A, B, ... AA, AB ...)
-    s = ""
-    while idx1 > 0:
-        idx1, rem = divmod(idx1 - 1, 26)
-        s = chr(65 + rem) + s
-    return s
+SEND_MODE = getattr(config, "SEND_MODE", "sync")  # "sync" | "async"
+SEND_CONCURRENCY = getattr(config, "SEND_CONCURRENCY", 20)  # requêtes en vol max (mode async)
+SEND_FANOUT = getattr(config, "SEND_FANOUT", True)  # un seul encodage par message identique, envoyé à tous ses chats
+PLANNING_STREAM_ROWS = getattr(config, "PLANNING_STREAM_ROWS", None)  # lecture du planning par tranches ; None = en un bloc
+SEND_ORDER = getattr(config, "SEND_ORDER", "planning")  # "planning" | "newest" | "edf" | "fair" (voir schedule)
+SEND_STALE_MINUTES = getattr(config, "SEND_STALE_MINUTES", None)  # retard au-delà duquel un message est périmé ; None = jamais
+SEND_STALE_ACTION = getattr(config, "SEND_STALE_ACTION", "defer")  # "defer" : envoyé après les autres ; "drop" : envoye=expire
+SEND_TIME_BUDGET_S = getattr(config, "SEND_TIME_BUDGET_S", None)  # durée d'envoi max par run ; le reste attend le run suivant
+OUTBOX_JOURNAL = getattr(config, "OUTBOX_JOURNAL", "outbox.sqlite")  # None = pas de journal local
+TELEGRAM_RATE_LIMIT = getattr(config, "TELEGRAM_RATE_LIMIT", True)
+TELEGRAM_RATE_GLOBAL = getattr(config, "TELEGRAM_RATE_GLOBAL", 30)        # msg/s tous chats confondus
+TELEGRAM_RATE_PER_CHAT = getattr(config, "TELEGRAM_RATE_PER_CHAT", 1)     # msg/s par chat privé
+TELEGRAM_RATE_PER_GROUP = getattr(config, "TELEGRAM_RATE_PER_GROUP", 20)  # msg/min par groupe/canal
+
+TELEGRAM_POOL_SIZE = getattr(config, "TELEGRAM_POOL_SIZE", max(10, SEND_CONCURRENCY))  # connexions keep-alive
+TELEGRAM_BACKOFF_BASE = getattr(config, "TELEGRAM_BACKOFF_BASE", 1.0)  # secondes, x2 par tentative (+ jitter)
+TELEGRAM_FILE_ID_CACHE = getattr(config, "TELEGRAM_FILE_ID_CACHE", "file_ids.sqlite")  # None = pas de cache
+TELEGRAM_FILE_ID_TTL = getattr(config, "TELEGRAM_FILE_ID_TTL", 24 * 3600)  # secondes ; image remplacée derrière la même URL ; None = jamais
+
+DT_FORMAT = "%Y-%m-%d %H:%M:%S"  # format écrit par Script_Planning
+
+TELEGRAM_API_BASE = getattr(config, "TELEGRAM_API_BASE", None) or "https://api.telegram.org"
+API_BASE = f"{TELEGRAM_API_BASE.rstrip('/')}/bot{TELEGRAM_TOKEN}"
+
+telegram = TelegramClient(
+    TELEGRAM_TOKEN,
+    timeout=TELEGRAM_TIMEOUT,
+    max_retries=TELEGRAM_MAX_RETRIES,
+    pool_size=TELEGRAM_POOL_SIZE,
+    backoff_base=TELEGRAM_BACKOFF_BASE,
+    limiter=(RateLimiter(TELEGRAM_RATE_GLOBAL, TELEGRAM_RATE_PER_CHAT, TELEGRAM_RATE_PER_GROUP)
+             if TELEGRAM_RATE_LIMIT else None),
+    api_base=API_BASE,
+    file_ids=FileIdCache(TELEGRAM_FILE_ID_CACHE, TELEGRAM_FILE_ID_TTL) if TELEGRAM_FILE_ID_CACHE else None,
+)
+
+def parse_dt_naive(dates, heures):
+    """Vectorized `date heure` -> naive datetime64 (NaT when unparseable).
+
+    One pass with the planning's fixed format; only rows that don't match it
+    fall back to the flexible per-row parser.
+    """
+    s = (dates.astype(str).str.strip() + " " + heures.astype(str).str.strip()).str.strip()
+    dt = pd.to_datetime(s, format=DT_FORMAT, errors="coerce")
+    bad = dt.isna() & (s != "")
+    if bad.any():
+        dt[bad] = [_parse_dt_one(x) for x in s[bad]]
+    return dt
+
+def _parse_dt_one(s):
+    try:
+        v = pd.to_datetime(s, errors="coerce")
+    except Exception:
+        return pd.NaT
+    if pd.isna(v):
+        return pd.NaT
+    return v.tz_localize(None) if v.tzinfo is not None else v
 
 def localize_safe(series_dt_naive, tz):
     return (series_dt_naive
             .dt.tz_localize(tz, ambiguous="infer", nonexistent="shift_forward"))
 
 def send_telegram_message(chat_id, text):
-    url = f"{API_BASE}/sendMessage"
-    payload = {"chat_id": chat_id, "text": text, "disable_web_page_preview": False}
-    return _post_with_retry(url, payload)
+    return telegram.send_message(chat_id, text)
 
 def send_telegram_photo(chat_id, photo_url, caption=None):
-    url = f"{API_BASE}/sendPhoto"
-    payload = {"chat_id": chat_id, "photo": photo_url}
-    if caption:
-        payload["caption"] = caption
-    return _post_with_retry(url, payload)
-
-def _post_with_retry(url, payload):
-    # Retries for 429 / certain 5xx
-    for attempt in range(1, TELEGRAM_MAX_RETRIES + 1):
-        try:
-            r = requests.post(url, data=payload, timeout=TELEGRAM_TIMEOUT)
-        except requests.RequestException as e:
-            if attempt >= TELEGRAM_MAX_RETRIES:
-                return False, f"request_exception:{e}"
-            time.sleep(2 ** attempt)
-            continue
+    return telegram.send_photo(chat_id, photo_url, caption=caption)
 
+def _send_job(job):
+    # job = dict(row, key, chat_id, text, fmt, url) ; returns (success, err)
+    try:
+        if job["fmt"] == "image" and job["url"]:
+            return send_telegram_photo(job["chat_id"], job["url"], caption=job["text"])
+        text = job["text"]
+        # si tu veux garder l'ajout du lien quand ce n'est pas une image :
+        if job["url"]:
+            text = f"{text}\n{job['url']}"
+        return send_telegram_message(job["chat_id"], text)
+    except Exception as e:
+        return False, f"exception:{e}"
+
+async def _send_jobs_async(send_one, jobs, concurrency):
+    # Bounded number of requests in flight; blocking requests run in worker threads
+    # and share the client's keep-alive pool
+    loop = asyncio.get_running_loop()
+    sem = asyncio.Semaphore(concurrency)
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        async def one(job):
+            async with sem:
+                return await loop.run_in_executor(pool, send_one, job)
+        return await asyncio.gather(*(one(j) for j in jobs))
+
+def _dispatch(send_one, items, mode=None, concurrency=None):
+    # Sequential, or bounded async pool; results come back in item order
+    mode = (mode or SEND_MODE or "sync").lower()
+    concurrency = max(1, int(concurrency or SEND_CONCURRENCY or 1))
+    if mode == "async" and len(items) > 1:
+        return asyncio.run(_send_jobs_async(send_one, items, concurrency))
+    return [send_one(it) for it in items]
+
+BUDGET_EXCEEDED = "budget"  # err of the jobs not sent because the run's time budget ran out
+
+def _over(deadline):
+    return deadline is not None and time.monotonic() > deadline
+
+def send_jobs(jobs, mode=None, concurrency=None, on_success=None, deadline=None):
+    """Send every job and return the (success, err) results in job order.
+
+    `on_success(job)` is called right after each delivery (e.g. to journal it).
+    Jobs reached after `deadline` (time.monotonic()) are not sent: (False, BUDGET_EXCEEDED).
+    """
+    def send_one(job):
+        if _over(deadline):
+            return False, BUDGET_EXCEEDED
+        success, err = _send_job(job)
+        if success and on_success is not None:
+            on_success(job)
+        return success, err
+
+    return _dispatch(send_one, jobs, mode, concurrency)
+
+class SendResults:
+    """Per-job outcome in job order: one byte per job, error text kept for failures only."""
+    __slots__ = ("ok", "errors")
+
+    def __init__(self, n):
+        self.ok = bytearray(n)
+        self.errors = {}
+
+    def set(self, i, success, err):
+        if success:
+            self.ok[i] = 1
+        else:
+            self.errors[i] = err
+
+    def __getitem__(self, i):
+        return bool(self.ok[i]), ("ok" if self.ok[i] else self.errors.get(i, "not_sent"))
+
+    def __len__(self):
+        return len(self.ok)
+
+def _job_request(job):
+    # Same payload rules as _send_job; identical tuples = identical requests
+    if job["fmt"] == "image" and job["url"]:
+        return ("photo", job["url"], job["text"])
+    text = job["text"]
+    if job["url"]:
+        text = f"{text}\n{job['url']}"
+    return ("text", text, None)
+
+def send_fanout(jobs, mode=None, concurrency=None, on_success=None, deadline=None):
+    """Like send_jobs, grouping jobs by payload: each distinct message is
+    encoded once and dispatched to all of its chats, still in job order.
+    Returns SendResults.
+    """
+    reqs = [_job_request(job) for job in jobs]
+    results = SendResults(len(jobs))
+
+    # Image URLs used more than once and not in the file_id cache yet: their
+    # first job (in schedule order) warms the cache for every other chat,
+    # whatever the caption; the others wait for it before being prepared
+    warming, warm = {}, {}  # url -> Event set once its first send is over ; job index -> that Event
+    if telegram.file_ids is not None:
+        uses = Counter(payload for kind, payload, _ in reqs if kind == "photo")
+        for i, (kind, payload, _) in enumerate(reqs):
+            if (kind == "photo" and uses[payload] > 1 and payload not in warming
+                    and telegram.file_ids.get(payload) is None):
+                warming[payload] = warm[i] = threading.Event()
+
+    prepared, lock = {}, threading.Lock()
+
+    def prepare(req):
+        # one prepared request per group, built on first use
+        with lock:
+            if req not in prepared:
+                kind, payload, caption = req
+                prepared[req] = (telegram.prepare_photo(payload, caption) if kind == "photo"
+                                 else telegram.prepare_message(payload))
+            return prepared[req]
+
+    def send_one(i):
+        job, req = jobs[i], reqs[i]
         try:
-            data = r.json()
-        except Exception:
-            data = {"ok": False, "error_code": r.status_code, "description": "invalid_json"}
-
-        if r.status_code == 429:
-            retry_after = 1
-            try:
-                retry_after = int(data.get("parameters", {}).get("retry_after", 1))
-            except Exception:
-                pass
-            time.sleep(retry_after + 1)
-            continue
-
-        if r.status_code >= 500 and attempt < TELEGRAM_MAX_RETRIES:
-            time.sleep(2 ** attempt)
-            continue
-
-        if r.ok and data.get("ok", False):
-            return True, "ok"
+            if _over(deadline):
+                results.set(i, False, BUDGET_EXCEEDED)
+                return
+            if i in warm:
+                kind, payload, caption = req
+                success, err = telegram.send_prepared(telegram.prepare_photo(payload, caption), job["chat_id"])
+            else:
+                if req[0] == "photo" and req[1] in warming:
+                    warming[req[1]].wait()
+                success, err = telegram.send_prepared(prepare(req), job["chat_id"])
+        except Exception as e:
+            success, err = False, f"exception:{e}"
+        finally:
+            if i in warm:
+                warm[i].set()
+        results.set(i, success, err)
+        if success and on_success is not None:
+            on_success(job)
 
-        # Other client errors: no retry
-        return False, f"{data.get('error_code','?')}:{data.get('description','unknown')}"
+    # Jobs go out in schedule order; a warm-up always starts before the jobs waiting on it
+    _dispatch(send_one, list(range(len(jobs))), mode, concurrency)
 
-    return False, "max_retries_exceeded"
+    metrics.incr("bot.fanout_groups", len(set(reqs)))
+    return results
 
 # ======================
-# Main
+# Planning I/O
 # ======================
 
-def lancer_bot():
-    tz = _tz()
-
-    # Auth Sheets
-    scope = [
-        "https://spreadsheets.google.com/feeds",
-        "https://www.googleapis.com/auth/drive",
-    ]
-    creds = Credentials.from_service_account_file(config.CHEMIN_CLE_JSON, scopes=scope)
-    client = gspread.authorize(creds)
-
-    # Open planning
-    ws_planning = client.open(config.FICHIER_PLANNING).worksheet(config.FEUILLE_PLANNING)
-
-    # Read all records + header to compute row numbers
-    rows = ws_planning.get_all_values()
-    if not rows:
-        print("Planning vide.")
-        return
-    header = rows[0]
-    data_rows = rows[1:]
-    if not data_rows:
-        print("Aucune ligne planning.")
-        return
-
+def _planning_df(header, data_rows, tz, row_ids=None):
+    """Typed planning frame: int saison / avancement, tz-aware `_dt`, and the
+    text columns as categoricals (clients, dates and messages repeat a lot).
+    """
+    # Index = planning row id (sheet row number unless the store says otherwise)
     df = pd.DataFrame(data_rows, columns=header)
+    df.index = row_ids if row_ids is not None else range(2, len(data_rows) + 2)
 
     # Ensure required columns exist
-    required = ["client","programme","saison","chat_id","date","heure","type","avancement","message","format","url","envoye"]
-    for c in required:
+    for c in PLANNING_COLS:
         if c not in df.columns:
             df[c] = ""
 
     # Normalize types
-    df["programme"] = df["programme"].apply(lambda x: str(x).zfill(3))
-    df["saison"] = pd.to_numeric(df["saison"], errors="coerce").fillna(1).astype(int)
-    df["avancement"] = pd.to_numeric(df["avancement"], errors="coerce").fillna(1).astype(int)
+    df["programme"] = df["programme"].astype(str).str.zfill(3)
+    df["saison"] = pd.to_numeric(df["saison"], errors="coerce").fillna(1).astype("int32")
+    df["avancement"] = pd.to_numeric(df["avancement"], errors="coerce").fillna(1).astype("int32")
 
     # Build datetime
-    def mk_dt(row):
-        s = f"{row['date']} {row['heure']}".strip()
-        try:
-            return pd.to_datetime(s, errors="coerce")
-        except Exception:
-            return pd.NaT
-
-    df["_dt_naive"] = df.apply(mk_dt, axis=1)
-    mask = df["_dt_naive"].notna()
+    dt_naive = parse_dt_naive(df["date"], df["heure"])
+    mask = dt_naive.notna()
+    df["_dt"] = pd.Series(pd.NaT, index=df.index, dtype=f"datetime64[ns, {tz.zone}]")
     if mask.any():
-        df.loc[mask, "_dt"] = localize_safe(df.loc[mask, "_dt_naive"].astype("datetime64[ns]"), tz)
-    else:
-        df["_dt"] = pd.NaT
-
-    now_local = datetime.now(tz)
-
-    # Filter candidates: envoye == "non" and datetime <= now (optionally within window)
+        df.loc[mask, "_dt"] = localize_safe(dt_naive[mask].astype("datetime64[ns]"), tz)
+
+    for c in PLANNING_COLS:
+        if c not in ("saison", "avancement"):
+            df[c] = df[c].astype(str).astype("category")
+    return df
+
+def _read_chunks(store, until_date=None, since_date=None):
+    # Whole due block at once, or chunk by chunk when PLANNING_STREAM_ROWS is set
+    if PLANNING_STREAM_ROWS:
+        return store.iter_due(until_date, since_date, int(PLANNING_STREAM_ROWS))
+    return [store.read_due(until_date, since_date)]
+
+def _iter_pending(chunks, tz, now=None, window_start=None):
+    """Generator pipeline over (header, rows, row_ids) chunks: yields
+    (header, pending rows frame) per chunk, the frame being None for an empty
+    chunk. Each chunk is typed and filtered (due by `now`, after
+    `window_start`) before the next one is read.
+    """
+    for header, data_rows, row_ids in chunks:
+        if not data_rows:
+            yield header, None
+            continue
+        df = _planning_df(header, data_rows, tz, row_ids)
+        elig = _pending_mask(df)
+        if now is not None:
+            elig &= df["_dt"] <= now
+        if window_start is not None:
+            elig &= df["_dt"] >= window_start
+        yield header, df[elig]
+
+def _pending_mask(df):
+    # envoye == "non", valid datetime and a message to send
     has_msg = df["message"].astype(str).str.strip() != ""
-    
-    elig = (
+    return (
         (df["envoye"].str.lower() == "non")
         & df["_dt"].notna()
-        & (df["_dt"] <= now_local)
-        & has_msg             # <<--- AJOUT
+        & has_msg
     )
-    
-    if SEND_WINDOW_MINUTES is not None:
-        window_start = now_local - timedelta(minutes=int(SEND_WINDOW_MINUTES))
-        elig = elig & (df["_dt"] >= window_start)
-    
-    df_send = df[elig].copy()
 
-    # Column indices (1-based) for A1 ranges
-    col_map = {name: (i+1) for i, name in enumerate(header)}
-    if "envoye" not in col_map:
-        raise RuntimeError("Colonne 'envoye' absente de la feuille planning.")
-    envoye_col_idx = col_map["envoye"]
-    envoye_col_letter = col_idx_to_a1(envoye_col_idx)
-
-    # Send loop
-    updates = []  # list of (row_index_1based, value)
+def _build_jobs(df_send):
+    jobs = []
     for idx, row in df_send.iterrows():
-        # Worksheet row number = idx in df + header row (1) + 1
-        ws_row_num = int(idx) + 2
+        # Row id in the store (worksheet row number for Google Sheets)
+        ws_row_num = int(idx)
 
         chat_id = row["chat_id"]
         raw_text = str(row["message"]).strip()  # on teste le "message" du planning, pas le texte après append url
@@ -186,43 +322,360 @@ def lancer_bot():
         if not raw_text:
             print(f"⏭️ Skip (message vide) ligne {ws_row_num} -> chat_id={chat_id}")
             continue
-        
-        try:
-            if fmt == "image" and url:
-                success, err = send_telegram_photo(chat_id, url, caption=raw_text)
-            else:
-                text = raw_text
-                # si tu veux garder l'ajout du lien quand ce n'est pas une image :
-                if url:
-                    text = f"{text}\n{url}"
-                success, err = send_telegram_message(chat_id, text)
-        except Exception as e:
-            success = False
-            err = f"exception:{e}"
 
+        key = tuple(str(row[c]) for c in KEY_COLS)
+        jobs.append({"row": ws_row_num, "key": key, "chat_id": chat_id, "text": raw_text, "fmt": fmt, "url": url,
+                     "ts": row["_dt"].timestamp()})
+    return jobs
+
+def _open_journal():
+    if not OUTBOX_JOURNAL:
+        return None
+    journal = OutboxJournal(OUTBOX_JOURNAL)
+    _purge_journal(journal)
+    return journal
+
+def _purge_journal(journal):
+    cutoff = datetime.now(_tz()).date() - timedelta(days=getattr(config, "RETENTION_JOURS", 2) + 1)
+    journal.purge(cutoff.strftime("%Y-%m-%d"))
+
+def schedule(jobs, now_ts, order=None, stale_minutes=None, stale_action=None):
+    """Order due jobs for sending; returns (to_send, expired).
+
+    - "planning": planning order (as read);
+    - "newest": most recent first, so the current slot isn't stuck behind a backlog;
+    - "edf": earliest deadline first, i.e. the oldest first;
+    - "fair": round-robin over chat_id, each chat in chronological order.
+
+    Jobs more than `stale_minutes` late go after all the others ("defer"),
+    or are not sent and come back in `expired` ("drop").
+    """
+    order = (order or SEND_ORDER or "planning").lower()
+    stale_minutes = SEND_STALE_MINUTES if stale_minutes is None else stale_minutes
+    stale_action = (stale_action or SEND_STALE_ACTION or "defer").lower()
+
+    def ordered(js):
+        if order == "planning":
+            return list(js)
+        if order == "newest":
+            return sorted(js, key=lambda j: -j["ts"])
+        if order == "edf":
+            return sorted(js, key=lambda j: j["ts"])
+        if order == "fair":
+            rank, seen = {}, Counter()
+            for j in sorted(js, key=lambda j: j["ts"]):
+                rank[id(j)] = seen[j["chat_id"]]
+                seen[j["chat_id"]] += 1
+            return sorted(js, key=lambda j: (rank[id(j)], j["ts"]))
+        raise ValueError(f"SEND_ORDER inconnu : {order}")
+
+    if stale_minutes is None:
+        return ordered(jobs), []
+    limit = now_ts - float(stale_minutes) * 60
+    fresh = [j for j in jobs if j["ts"] >= limit]
+    stale = [j for j in jobs if j["ts"] < limit]
+    if stale_action == "drop":
+        return ordered(fresh), stale
+    return ordered(fresh) + ordered(stale), []
+
+def _send_and_collect(jobs, journal=None, now_ts=None, budget_s=None):
+    """Send jobs; returns (updates, keys) for the envoye write-back.
+
+    Jobs already in the outbox journal (sent by a run that crashed before its
+    write-back) are not sent again, only marked. The others are ordered by
+    schedule() and sent until `budget_s` seconds have passed; the rest stays
+    envoye=non for the next run.
+    """
+    done = journal.sent_keys([j["key"] for j in jobs]) if journal is not None else set()
+    now_ts = time.time() if now_ts is None else now_ts
+    to_send, expired = schedule([j for j in jobs if j["key"] not in done], now_ts)
+    deadline = time.monotonic() + float(budget_s) if budget_s else None
+
+    # Send (sequential or bounded async pool), results come back in job order
+    on_success = (lambda job: journal.record(job["key"])) if journal is not None else None
+    if SEND_FANOUT:
+        results = send_fanout(to_send, on_success=on_success, deadline=deadline)
+    else:
+        results = send_jobs(to_send, on_success=on_success, deadline=deadline)
 
+    updates = []  # list of (row_index_1based, value)
+    keys = []
+    for job in jobs:
+        if job["key"] in done:
+            metrics.incr("bot.journal_skipped")
+            updates.append((job["row"], "oui"))
+            keys.append(job["key"])
+            print(f"↩️ Déjà envoyé (journal), marquage seul (ligne {job['row']}) -> chat_id={job['chat_id']}")
+    for i, job in enumerate(to_send):
+        success, err = results[i]
         if success:
-            updates.append((ws_row_num, "oui"))
-            print(f"✅ Envoyé (ligne {ws_row_num}) -> chat_id={chat_id}")
+            metrics.incr("bot.sent")
+            updates.append((job["row"], "oui"))
+            keys.append(job["key"])
+            print(f"✅ Envoyé (ligne {job['row']}) -> chat_id={job['chat_id']}")
+        elif err == BUDGET_EXCEEDED:
+            metrics.incr("bot.deferred")
+            print(f"⏸️ Reporté (budget de temps écoulé) ligne {job['row']} -> chat_id={job['chat_id']}")
         else:
-            print(f"⚠️ Echec envoi (ligne {ws_row_num}) -> chat_id={chat_id} ; {err}")
-
-    # Batch update only changed 'envoye' cells
+            metrics.incr("bot.failed")
+            metrics.logger.warning(f"Echec envoi (ligne {job['row']}) -> chat_id={job['chat_id']} ; {err}")
+            print(f"⚠️ Echec envoi (ligne {job['row']}) -> chat_id={job['chat_id']} ; {err}")
+    for job in expired:
+        metrics.incr("bot.expired")
+        updates.append((job["row"], "expire"))
+        print(f"🗑️ Périmé, non envoyé (ligne {job['row']}) -> chat_id={job['chat_id']}")
+    return updates, keys
+
+def _write_envoye(store, header, updates):
+    # Only the changed 'envoye' cells
     if updates:
-        batch_body = {
-            "valueInputOption": "RAW",
-            "data": []
-        }
-        for rownum, value in updates:
-            rng = f"{envoye_col_letter}{rownum}:{envoye_col_letter}{rownum}"
-            batch_body["data"].append({
-                "range": f"{config.FEUILLE_PLANNING}!{rng}",
-                "values": [[value]]
-            })
-        ws_planning.spreadsheet.values_batch_update(batch_body)
-        print(f"Marqués 'envoye=oui' pour {len(updates)} ligne(s).")
+        store.mark_sent(header, updates)
+        expired = sum(1 for _, v in updates if v == "expire")
+        print(f"Marqués 'envoye=oui' pour {len(updates) - expired} ligne(s)."
+              + (f" 'envoye=expire' pour {expired} ligne(s)." if expired else ""))
 
+def _print_send_stats():
+    print(f"⏱️ Throttle {telegram.stats['throttle_s']:.1f}s ; retries {telegram.stats['retry_s']:.1f}s ({telegram.stats['http_429']} x 429)")
+
+# ======================
+# Main
+# ======================
+
+def lancer_bot(store=None, chunks=None):
+    """One pass over the due rows. `store` / `chunks` (planning rows already
+    read, see Script_Bot_Lite) are read here when not given.
+    """
+    tz = _tz()
+    store = store or open_store()
+    now_local = datetime.now(tz)
+
+    # Pending rows up to today (from the window start day if any), with their row ids:
+    # only that block of the planning is fetched when the store keeps a date index
+    since = window_start = None
+    if SEND_WINDOW_MINUTES is not None:
+        window_start = now_local - timedelta(minutes=int(SEND_WINDOW_MINUTES))
+        since = window_start.strftime("%Y-%m-%d")
+    if chunks is None:
+        chunks = _read_chunks(store, now_local.strftime("%Y-%m-%d"), since)
+
+    # Filter candidates: envoye == "non" and datetime <= now (optionally within window)
+    header, has_rows, jobs = [], False, []
+    with metrics.timer("bot.prepare"):
+        for header, df_send in _iter_pending(chunks, tz, now_local, window_start):
+            if df_send is not None:
+                has_rows = True
+                jobs.extend(_build_jobs(df_send))
+    if not header:
+        print("Planning vide.")
+        return
+    if not has_rows:
+        print("Aucune ligne planning.")
+        return
+    if "envoye" not in header:
+        raise RuntimeError("Colonne 'envoye' absente de la feuille planning.")
+
+    journal = _open_journal()
+    with metrics.timer("bot.send"):
+        updates, keys = _send_and_collect(jobs, journal, now_local.timestamp(), SEND_TIME_BUDGET_S)
+    _write_envoye(store, header, updates)
+    if journal is not None:
+        journal.mark_synced(keys)
+        journal.close()
+    store.close()
+
+    _print_send_stats()
     print(f"🕒 Terminé à {now_local.strftime('%Y-%m-%d %H:%M:%S %Z')}")
 
+# ======================
+# Daemon
+# ======================
+
+DAEMON_REFRESH_MINUTES = getattr(config, "DAEMON_REFRESH_MINUTES", 15)  # relecture du planning
+DAEMON_RETRY_SECONDS = getattr(config, "DAEMON_RETRY_SECONDS", 60)  # envoi échoué : réessayé après ce délai, x2 à chaque échec
+DAEMON_MAX_SLEEP = 60  # secondes ; borne le sommeil pour rester réactif aux signaux
+
+class PlanningQueue:
+    """In-memory priority queue of pending planning rows, ordered by `_dt`.
+
+    Rows are identified by their natural key (KEY_COLS) so that a refresh
+    after the planning was rewritten (rows shifted) keeps the queue valid.
+    """
+
+    def __init__(self):
+        self.heap = []          # (timestamp, seq, key)
+        self.jobs = {}          # key -> job (row number refreshed on each load)
+        self.header = []
+        self.failures = Counter()  # key -> consecutive failed sends
+        self._seq = 0
+
+    def load(self, chunks, tz):
+        """Merge a fresh read of the sheet (planning chunks); returns the number of new rows queued."""
+        header, fresh = [], {}
+        for header, df in _iter_pending(chunks, tz):
+            if df is None:
+                continue
+            for job in _build_jobs(df):
+                fresh[job["key"]] = (df.at[job["row"], "_dt"], job)
+        self.header = header
+
+        added = 0
+        for key, (dt, job) in fresh.items():
+            if key not in self.jobs:
+                self._seq += 1
+                heapq.heappush(self.heap, (dt.timestamp(), self._seq, key))
+                added += 1
+        # rows gone from the sheet or marked sent elsewhere are dropped lazily in pop_due
+        self.jobs = {k: job for k, (_, job) in fresh.items()}
+        self.failures = Counter({k: n for k, n in self.failures.items() if k in self.jobs})
+        return added
+
+    def retry(self, jobs, now_ts, base_s, max_s):
+        """Queue undelivered jobs again, due after an exponential backoff (capped at max_s)."""
+        for job in jobs:
+            key = job["key"]
+            self.failures[key] += 1
+            delay = min(max_s, base_s * 2 ** (self.failures[key] - 1))
+            self.jobs[key] = job
+            self._seq += 1
+            heapq.heappush(self.heap, (now_ts + delay, self._seq, key))
+
+    def remap(self, marks):
+        """{key: (row, value)} envoye marks, moved to the row ids of the last load.
+
+        Rows no longer pending there (purged, or marked by another run) are
+        left out. The keys kept are dropped from the queue.
+        """
+        out = {}
+        for key, (row, value) in marks.items():
+            job = self.jobs.pop(key, None)
+            if job is None:
+                print(f"⏭️ Ligne {row} absente du planning relu, non marquée")
+                continue
+            out[key] = (job["row"], value)
+        return out
+
+    def next_due(self):
+        while self.heap and self.heap[0][2] not in self.jobs:
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else None
+
+    def pop_due(self, now_ts, window_start_ts=None):
+        due = []
+        while self.heap and self.heap[0][0] <= now_ts:
+            _, _, key = heapq.heappop(self.heap)
+            job = self.jobs.pop(key, None)
+            if job is None:
+                continue
+            # window on the planned time, not on a retry's time
+            if window_start_ts is not None and job["ts"] < window_start_ts:
+                print(f"⏭️ Skip (hors fenêtre) ligne {job['row']} -> chat_id={job['chat_id']}")
+                continue
+            due.append(job)
+        return due
+
+def lancer_daemon():
+    """Long-running mode: load the planning once, sleep until the next due row.
+
+    The planning is re-read every DAEMON_REFRESH_MINUTES, and only if its
+    version (Drive modifiedTime for Sheets) moved since the last read or write.
+    A failed read or write-back (quota, network) is retried after a backoff;
+    sends go on meanwhile and their envoye marks wait in memory (and in the
+    outbox journal).
+    """
+    tz = _tz()
+    store = open_store()
+    journal = _open_journal()
+    queue = PlanningQueue()
+    refresh_every = max(60, int(float(DAEMON_REFRESH_MINUTES) * 60))
+    next_refresh = retry_at = 0.0
+    last_modified = None
+    pending = {}  # key -> (row, value) : marques envoye pas encore écrites
+    errors = 0
+    purged_on = datetime.now(tz).date()
+
+    print(f"🤖 Démon démarré (relecture toutes les {refresh_every // 60} min)")
+    try:
+        while True:
+            try:
+                if time.monotonic() >= max(next_refresh, retry_at):
+                    modified = store.planning_version()
+                    if modified is None or modified != last_modified:
+                        added = queue.load(_read_chunks(store), tz)
+                        pending = queue.remap(pending)
+                        last_modified = modified
+                        print(f"🔄 Planning relu : {len(queue.jobs)} en attente (+{added})")
+                    next_refresh = time.monotonic() + refresh_every
+                    if journal is not None and datetime.now(tz).date() != purged_on:
+                        _purge_journal(journal)
+                        purged_on = datetime.now(tz).date()
+
+                now_local = datetime.now(tz)
+                window_start_ts = None
+                if SEND_WINDOW_MINUTES is not None:
+                    window_start_ts = (now_local - timedelta(minutes=int(SEND_WINDOW_MINUTES))).timestamp()
+                jobs = queue.pop_due(now_local.timestamp(), window_start_ts)
+                if jobs:
+                    with metrics.timer("bot.send"):
+                        updates, keys = _send_and_collect(jobs, journal)
+                    # Not delivered (network error, 5xx...): back in the queue, retried after a backoff
+                    handled = {row for row, _ in updates}
+                    queue.retry([j for j in jobs if j["row"] not in handled], datetime.now(tz).timestamp(),
+                                float(DAEMON_RETRY_SECONDS), refresh_every)
+                    key_of = {j["row"]: j["key"] for j in jobs}
+                    pending.update({key_of[row]: (row, value) for row, value in updates})
+                    _print_send_stats()
+                    metrics.emit("daemon")  # un rapport par lot envoyé
+
+                if pending and time.monotonic() >= retry_at:
+                    # Planning changed since the last read (e.g. rewritten by Script_Planning):
+                    # row ids may have shifted, re-read it and mark the rows where they are now
+                    modified = store.planning_version()
+                    if modified is None or modified != last_modified:
+                        queue.load(_read_chunks(store), tz)
+                        pending = queue.remap(pending)
+                        last_modified = modified
+                        next_refresh = time.monotonic() + refresh_every
+                        print(f"🔄 Planning relu avant marquage : {len(queue.jobs)} en attente")
+                    _write_envoye(store, queue.header, list(pending.values()))
+                    if journal is not None:
+                        journal.mark_synced([k for k, (_, v) in pending.items() if v == "oui"])
+                    pending = {}
+                    # Our own write: the version read just before it matched the last read
+                    last_modified = store.planning_version()
+                errors = 0
+            except Exception as e:
+                # quota / network: keep the queue and the unwritten marks, try again later
+                errors += 1
+                wait = min(refresh_every, float(DAEMON_RETRY_SECONDS) * 2 ** (errors - 1))
+                retry_at = time.monotonic() + wait
+                metrics.incr("daemon.errors")
+                metrics.logger.warning(f"Erreur démon : {e}")
+                print(f"⚠️ Erreur ({e}) ; nouvel essai dans {wait:.1f}s"
+                      + (f", {len(pending)} marquage(s) en attente" if pending else ""))
+
+            wake = max(next_refresh, retry_at)
+            if pending:
+                wake = min(wake, retry_at)
+            next_ts = queue.next_due()
+            sleep_until_refresh = wake - time.monotonic()
+            sleep_until_due = (next_ts - datetime.now(tz).timestamp()) if next_ts is not None else sleep_until_refresh
+            time.sleep(max(0.0, min(sleep_until_refresh, sleep_until_due, DAEMON_MAX_SLEEP)))
+    except KeyboardInterrupt:
+        if pending:
+            print(f"⚠️ {len(pending)} marquage(s) envoye non écrit(s) ; le journal évite le renvoi au prochain démarrage")
+        print("🛑 Démon arrêté.")
+    finally:
+        if journal is not None:
+            journal.close()
+        store.close()
+
 if __name__ == "__main__":
-    lancer_bot()
+    parser = argparse.ArgumentParser(description="Envoi des messages Telegram planifiés.")
+    parser.add_argument("--daemon", action="store_true",
+                        help="reste actif et envoie chaque message à son heure (au lieu d'un passage unique)")
+    args = parser.parse_args()
+    if args.daemon:
+        lancer_daemon()
+    else:
+        with metrics.run("bot"):
+            lancer_bot()
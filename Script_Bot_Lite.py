@@ -0,0 +1,109 @@
+"""Fast-start entry point for the scheduled bot run.
+
+    python Script_Bot_Lite.py                      # même envoi que python Script_Bot.py
+    python -X importtime Script_Bot_Lite.py 2> imports.log   # détail module par module
+
+Reads the due block of the planning and looks for due rows with a plain
+Python scan. pandas and Script_Bot (Telegram client, caches...) are only
+imported when at least one row may be due; idle runs stop right there.
+Import and startup times go to the run metrics (startup.*).
+"""
+import time
+_T0 = time.perf_counter()
+
+import importlib
+import re
+from datetime import datetime, timedelta
+import pytz
+import config
+import metrics
+
+_T_IMPORTS = time.perf_counter() - _T0
+
+SEND_WINDOW_MINUTES = getattr(config, "SEND_WINDOW_MINUTES", None)
+PLANNING_STREAM_ROWS = getattr(config, "PLANNING_STREAM_ROWS", None)
+
+DT_RE = re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}")  # format écrit par Script_Planning
+
+def _tz():
+    try:
+        return pytz.timezone(config.FUSEAU_HORAIRE)
+    except Exception:
+        return pytz.timezone("Europe/Paris")
+
+def _import(name):
+    t0 = time.perf_counter()
+    module = importlib.import_module(name)
+    metrics.observe(f"startup.import.{name}", time.perf_counter() - t0)
+    return module
+
+def _dst_ambiguous(tz, now):
+    try:
+        tz.localize(now.replace(tzinfo=None), is_dst=None)
+        return False
+    except pytz.exceptions.AmbiguousTimeError:
+        return True
+
+def maybe_due(header, rows, row_ids, now_s, since_s=None):
+    """(rows, row_ids) that may be due at `now_s` ("YYYY-MM-DD HH:MM:SS", local).
+
+    Planning dates are written in that format, so comparing strings is
+    enough. Rows in any other format are kept: Script_Bot's parser decides.
+    """
+    if not {"envoye", "date", "heure", "message"} <= set(header):
+        return rows, row_ids  # Script_Bot reports the missing column
+    e, d, h, m = (header.index(c) for c in ("envoye", "date", "heure", "message"))
+    cell = lambda row, i: str(row[i]).strip() if i < len(row) else ""
+    out, ids = [], []
+    for row, rid in zip(rows, row_ids):
+        if cell(row, e).lower() != "non" or not cell(row, m):
+            continue
+        dt = f"{cell(row, d)} {cell(row, h)}"
+        if DT_RE.fullmatch(dt) and (dt > now_s or (since_s is not None and dt < since_s)):
+            continue
+        out.append(row)
+        ids.append(rid)
+    return out, ids
+
+def main():
+    with metrics.run("bot"):
+        metrics.observe("startup.imports", _T_IMPORTS)
+        tz = _tz()
+        now = datetime.now(tz)
+        chunks = None
+
+        # Chunked reads are not kept: Script_Bot reads them itself
+        if not PLANNING_STREAM_ROWS:
+            t0 = time.perf_counter()
+            storage = _import("storage")
+            if (getattr(config, "STORAGE_BACKEND", "gsheets") or "gsheets").lower() == "gsheets":
+                _import("gspread")
+            store = storage.open_store()
+            since = window_start = None
+            if SEND_WINDOW_MINUTES is not None:
+                window_start = now - timedelta(minutes=int(SEND_WINDOW_MINUTES))
+                since = window_start.strftime("%Y-%m-%d")
+            header, rows, row_ids = store.read_due(now.strftime("%Y-%m-%d"), since)
+
+            # Wall-clock strings can't order the repeated hour of a DST change: leave it to Script_Bot
+            if _dst_ambiguous(tz, now):
+                due, due_ids = rows, row_ids
+            else:
+                due, due_ids = maybe_due(header, rows, row_ids, now.strftime("%Y-%m-%d %H:%M:%S"),
+                                         window_start.strftime("%Y-%m-%d %H:%M:%S") if window_start else None)
+            metrics.observe("startup.check", time.perf_counter() - t0)
+            if not due:
+                store.close()
+                print(f"Rien à envoyer ({len(rows)} ligne(s) lue(s)) ; terminé en {time.perf_counter() - _T0:.3f}s")
+                return
+            chunks = [(header, due, due_ids)]
+        else:
+            store = None
+
+        bot = _import("Script_Bot")
+        metrics.observe("startup.total", time.perf_counter() - _T0)
+        print(f"⏱️ Démarrage {time.perf_counter() - _T0:.3f}s")
+        bot.lancer_bot(store=store, chunks=chunks)
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,11 @@
-import gspread
-from google.oauth2.service_account import Credentials
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 from collections import defaultdict
 import pytz
 import config
+import metrics
+from storage import KEY_COLS, PLANNING_COLS, open_store, records_from_values
 
 # ========= Helpers =========
 
@@ -51,8 +52,35 @@ def _norm_chat(s):
         s = s[:-2]
     return s
 
-def _weekday_fr(d):
-    return ["lundi","mardi","mercredi","jeudi","vendredi","samedi","dimanche"][d.weekday()]
+JOURS_FR = ["lundi","mardi","mercredi","jeudi","vendredi","samedi","dimanche"]
+
+def _diffusion_weekdays(jours):
+    """Weekday numbers (0 = lundi) of the diffusion days; every day when `jours` is empty."""
+    if not jours:
+        return frozenset(range(7))
+    return frozenset(i for i, name in enumerate(JOURS_FR) if name in jours)
+
+def _count_diffusion_days(start, end, weekdays):
+    """Number of diffusion days in [start, end], in O(1) (scalar form of the avancement of _expand_planning)."""
+    if end < start:
+        return 0
+    full_weeks, rest = divmod((end - start).days + 1, 7)
+    first = start.weekday()
+    return full_weeks * len(weekdays) + sum(1 for i in range(rest) if (first + i) % 7 in weekdays)
+
+def _nth_diffusion_day(start, n, weekdays):
+    """Date of the n-th (1-based) diffusion day from `start`, in O(1); None if there is none."""
+    if n <= 0 or not weekdays:
+        return None
+    # every 7-day block from `start` holds exactly len(weekdays) diffusion days
+    full_weeks, rank = divmod(n - 1, len(weekdays))
+    base = start + timedelta(days=7 * full_weeks)
+    first = base.weekday()
+    for i in range(7):
+        if (first + i) % 7 in weekdays:
+            if rank == 0:
+                return base + timedelta(days=i)
+            rank -= 1
 
 def _parse_jours_diffusion(v):
     if isinstance(v, (list, tuple)):
@@ -72,6 +100,191 @@ def _normalize_key_columns(df):
     df["heure"]     = df["heure"].apply(_norm_hms)
     # type left empty at generation; filled later
 
+PROG_COLS = ["Support","Saison","Jour","Type","Phrase","Format","Url"]
+
+def _tab_records(values):
+    """Programme tab values -> records (None when the tab can't be parsed)."""
+    try:
+        return records_from_values(values)
+    except Exception:
+        return None
+
+def _parse_types(records):
+    types_id_to_label, types_label_to_id = {}, {}
+    if not records:
+        return types_id_to_label, types_label_to_id
+    dft = pd.DataFrame(records)
+    for _,r in dft.iterrows():
+        try:
+            tid = int(pd.to_numeric(r.get("Id",""), errors="coerce"))
+        except Exception:
+            continue
+        lbl = str(r.get("Type","")).strip()
+        if lbl:
+            types_id_to_label[tid] = lbl
+            types_label_to_id[lbl.lower()] = tid
+    return types_id_to_label, types_label_to_id
+
+def _programme_df(records):
+    try:
+        if records is None:
+            raise ValueError("onglet programme absent")
+        dfp = pd.DataFrame(records)
+        for c in PROG_COLS:
+            if c not in dfp.columns: dfp[c] = ""
+        dfp["Saison"] = pd.to_numeric(dfp["Saison"], errors="coerce").fillna(1).astype(int)
+        dfp["Jour"] = pd.to_numeric(dfp["Jour"], errors="coerce").fillna(1).astype(int)
+        dfp["Type"] = pd.to_numeric(dfp["Type"], errors="coerce").astype("Int64")
+    except Exception:
+        dfp = pd.DataFrame(columns=PROG_COLS)
+    return dfp
+
+def _rank_programme(dfp):
+    """Programme rows with their rank (1-based) inside each (Saison, Jour), by Type."""
+    # same ordering as sort_values("Type") on each (Saison, Jour) subset: stable, NA last
+    ordered = dfp.sort_values(["Saison","Jour","Type"], kind="stable", na_position="last")
+    return ordered.assign(_rank=ordered.groupby(["Saison","Jour"], sort=False).cumcount() + 1)
+
+# ========= Planning expansion =========
+
+NEW_ROW_COLS = ["client","programme","saison","chat_id","date","heure","type","avancement",
+                "message","format","url","envoye","_slot"]
+
+def _expand_planning(dfc, dates_fenetre):
+    """Clients x window dates x slots 1..3 -> new planning rows (without type/message).
+
+    Vectorized: one cross join, a weekday mask and array arithmetic for the
+    avancement (same counts as _count_diffusion_days). Returns (dfn, skips).
+    """
+    client = dfc["Client"].astype(str).str.strip()
+    chat = dfc["Canal ID"].astype(str).str.strip()
+    start = pd.to_datetime(dfc["Date de Démarrage"], errors="coerce")
+    heures = [dfc[f"Heure envoi {k}"].fillna("").astype(str) for k in (1,2,3)]
+
+    no_client = (client == "").to_numpy()
+    no_chat = ~no_client & (chat == "").to_numpy()
+    bad_date = ~no_client & ~no_chat & start.isna().to_numpy()
+    valid = ~(no_client | no_chat | bad_date)
+    no_hour = valid & np.logical_and.reduce([(h == "").to_numpy() for h in heures])
+    skips = {"client_vide": int(no_client.sum()), "canalid_vide": int(no_chat.sum()),
+             "date_invalide": int(bad_date.sum()), "sans_heure": int(no_hour.sum())}
+    if not valid.any() or not dates_fenetre:
+        return pd.DataFrame(), skips
+
+    # Per client: weekday mask (7 bools) and start day
+    weekdays = dfc["Jours de Diffusion"][valid].apply(_diffusion_weekdays)
+    wd = np.array([[i in w for i in range(7)] for w in weekdays], dtype=bool)
+    start_d = start[valid].to_numpy().astype("datetime64[D]")
+    first = ((start_d.astype("int64") + 3) % 7).astype(int)   # 1970-01-01 was a Thursday (3)
+    # prefix[c, r] = diffusion days among the first r days counted from start (r = 0..7)
+    rolled = wd[np.arange(len(wd))[:, None], (first[:, None] + np.arange(7)) % 7]
+    prefix = np.concatenate([np.zeros((len(wd), 1), dtype=int), rolled.cumsum(axis=1)], axis=1)
+
+    # Cross join clients x dates, keep diffusion days only
+    days = np.array(dates_fenetre, dtype="datetime64[D]")
+    ci = np.repeat(np.arange(len(wd)), len(days))
+    di = np.tile(np.arange(len(days)), len(wd))
+    dow = np.array([d.weekday() for d in dates_fenetre])[di]
+    keep = wd[ci, dow]
+    ci, di = ci[keep], di[keep]
+
+    # avancement = diffusion days in [start, d]
+    span = (days[di] - start_d[ci]).astype(int) + 1
+    full_weeks, rest = np.divmod(np.maximum(span, 0), 7)
+    adv = full_weeks * wd.sum(axis=1)[ci] + prefix[ci, rest]
+
+    base = pd.DataFrame({
+        "client": client[valid].to_numpy()[ci],
+        "programme": dfc["Programme"][valid].astype(str).str.strip().to_numpy()[ci],
+        "saison": dfc["Saison"][valid].astype(int).to_numpy()[ci],
+        "chat_id": chat[valid].to_numpy()[ci],
+        "date": np.array([d.strftime("%Y-%m-%d") for d in dates_fenetre])[di],
+        "_ci": ci,
+        "_di": di,
+        "avancement": adv.astype(int),
+    })
+    parts = []
+    for k, h in zip((1,2,3), heures):
+        hk = h[valid].to_numpy()[ci]
+        part = base.assign(heure=hk, _slot=k)[hk != ""]
+        parts.append(part)
+    dfn = pd.concat(parts, ignore_index=True)
+    if dfn.empty:
+        return pd.DataFrame(), skips
+    dfn = dfn.sort_values(["_ci","_di","_slot"], kind="stable", ignore_index=True)
+    dfn = dfn.assign(type="", message="", format="", url="", envoye="non")
+    return dfn[NEW_ROW_COLS], skips
+
+# ========= Message fill =========
+
+class _ProgrammeCache:
+    """Programme tabs parsed on first use."""
+
+    def __init__(self, tabs):
+        self.tabs = tabs
+        self._df = {}
+
+    def df(self, prog):
+        prog = str(prog).zfill(3)
+        if prog not in self._df:
+            self._df[prog] = _programme_df(self.tabs.get(prog))
+        return self._df[prog]
+
+    def long(self, progs):
+        """One table for every programme in `progs`, keyed by (programme, Saison, Jour, _rank)."""
+        parts = [_rank_programme(self.df(p)).assign(programme=str(p).zfill(3)) for p in progs]
+        parts = [p for p in parts if not p.empty]
+        if not parts:
+            return pd.DataFrame(columns=["programme","Saison","Jour","_rank"] + PROG_COLS[3:])
+        out = pd.concat(parts, ignore_index=True)[["programme","Saison","Jour","_rank"] + PROG_COLS[3:]]
+        # all-number text columns would turn float in the left merge (123 -> "123.0")
+        return out.astype({"Phrase": object, "Format": object, "Url": object})
+
+def _slot_ranks(dfm):
+    """Slot 1..n of each row within its (client, programme, saison, date), by heure (unparseable last)."""
+    heure = pd.to_datetime(dfm["heure"], format="%H:%M:%S", errors="coerce")
+    ranks = heure.groupby([dfm["client"], dfm["programme"], dfm["saison"], dfm["date"]])\
+                 .rank(method="first", na_option="bottom")
+    return ranks.astype(int)
+
+def _fill_planning(dfm, tabs, types_id_to_label, recompute_slots):
+    """Slot + type/message/format/url for the planning rows.
+
+    Columnar: the programme rows are stacked in one table and attached with
+    a single merge.
+    """
+    dfm = dfm.copy()
+    if dfm.empty:
+        return dfm.assign(type=[], message=[], format=[], url=[])
+    programmes = _ProgrammeCache(tabs)
+
+    # Determine slot position for rows (if _slot missing because it came from existing dfe)
+    if recompute_slots:
+        with metrics.timer("planning.slots"):
+            dfm["_slot"] = _slot_ranks(dfm)
+
+    # k-th row (k = slot) of the programme day, rows sorted by Type id
+    prog = dfm["programme"].astype(str).str.zfill(3)
+    saison = pd.to_numeric(dfm["saison"], errors="coerce").replace(0, np.nan).fillna(1).astype(int)
+    jour = pd.to_numeric(dfm["avancement"], errors="coerce").replace(0, np.nan).fillna(1).astype(int)
+    keys = pd.DataFrame({"programme": prog.to_numpy(), "Saison": saison.to_numpy(),
+                         "Jour": jour.to_numpy(), "_rank": dfm["_slot"].astype(int).to_numpy()})
+    rec = keys.merge(programmes.long(prog.unique()), on=["programme","Saison","Jour","_rank"], how="left")
+
+    phrase = rec["Phrase"]
+    found = (phrase.notna() & (phrase.astype(str) != "")).to_numpy()
+    type_id = pd.to_numeric(rec["Type"], errors="coerce").fillna(0).astype(int)
+    label = type_id.map(types_id_to_label).fillna(type_id.astype(str))
+    message = ("Saison " + saison.astype(str).to_numpy() + " - Jour " + jour.astype(str).to_numpy()
+               + " : \n" + label + " : " + phrase.astype(str))
+    fmt = rec["Format"].astype(str).str.strip().str.lower().replace("", "texte")
+
+    dfm["type"] = np.where(found, label, "")
+    dfm["message"] = np.where(found, message, "")
+    dfm["format"] = np.where(found, fmt, "texte")
+    dfm["url"] = np.where(found, rec["Url"].astype(str), "")
+    return dfm
+
 # ========= Main =========
 
 def generer_planning():
@@ -80,17 +293,11 @@ def generer_planning():
     RETENTION = getattr(config, "RETENTION_JOURS", 2)
     DEFAULT_SLOT_TYPE_IDS = getattr(config, "DEFAULT_SLOT_TYPE_IDS", [1,2,3])
 
-    # Auth
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    creds = Credentials.from_service_account_file(config.CHEMIN_CLE_JSON, scopes=scope)
-    client = gspread.authorize(creds)
-
-    ws_clients = client.open(config.FICHIER_CLIENTS).worksheet(config.FEUILLE_CLIENTS)
-    ws_planning = client.open(config.FICHIER_PLANNING).worksheet(config.FEUILLE_PLANNING)
-    doc_programmes = client.open(config.FICHIER_PROGRAMMES)
+    # Storage (Google Sheets or local SQLite, see STORAGE_BACKEND)
+    store = open_store()
 
     # Read Clients
-    dfc = pd.DataFrame(ws_clients.get_all_records())
+    dfc = pd.DataFrame(records_from_values(store.read_clients()))
     required = ["Client","Thème","Canal ID","Programme","Saison","Date de Démarrage",
                 "Jours de Diffusion","Heure envoi 1","Heure envoi 2","Heure envoi 3"]
     for c in required:
@@ -124,83 +331,19 @@ def generer_planning():
     dates_fenetre = [today + timedelta(days=i) for i in range(NB_JOURS)]
     print(f"[DEBUG] today={today} NB_JOURS={NB_JOURS} dates={dates_fenetre}")
 
-    # Read Types mapping from 'Types'
-    types_id_to_label, types_label_to_id = {}, {}
-    try:
-        ws_types = doc_programmes.worksheet("Types")
-        dft = pd.DataFrame(ws_types.get_all_records())
-        for _,r in dft.iterrows():
-            try:
-                tid = int(pd.to_numeric(r.get("Id",""), errors="coerce"))
-            except Exception:
-                continue
-            lbl = str(r.get("Type","")).strip()
-            if lbl:
-                types_id_to_label[tid] = lbl
-                types_label_to_id[lbl.lower()] = tid
-    except Exception:
-        pass
-
     # Generate planning rows WITHOUT type; include internal _slot
-    rows = []
-    skips = {"client_vide":0,"canalid_vide":0,"date_invalide":0,"sans_heure":0}
-    for _, r in dfc.iterrows():
-        client_name = str(r["Client"]).strip()
-        chat_id = str(r["Canal ID"]).strip()
-        prog = str(r["Programme"]).strip()
-        saison = int(r["Saison"])
-        start = r["Date de Démarrage"]
-        jours = r["Jours de Diffusion"]
-        if not client_name: skips["client_vide"]+=1; continue
-        if not chat_id: skips["canalid_vide"]+=1; continue
-        if pd.isna(start): skips["date_invalide"]+=1; continue
-
-        # avancement counting only diffusion days
-        max_d = max(dates_fenetre)
-        cnt=0; adv_by_date={}
-        cur = start.date()
-        while cur <= max_d:
-            if len(jours)==0 or _weekday_fr(cur) in jours:
-                cnt += 1
-            adv_by_date[cur]=cnt
-            cur += timedelta(days=1)
-
-        for d in dates_fenetre:
-            if len(jours)!=0 and _weekday_fr(d) not in jours:
-                continue
-            adv = int(adv_by_date.get(d,0))
-            # Build slots 1..3
-            for k in (1,2,3):
-                h = r.get(f"Heure envoi {k}", "")
-                if not h:
-                    continue
-                rows.append({
-                    "client": client_name,
-                    "programme": prog,
-                    "saison": saison,
-                    "chat_id": chat_id,
-                    "date": d.strftime("%Y-%m-%d"),
-                    "heure": h,
-                    "type": "",  # will be filled later
-                    "avancement": adv,
-                    "message": "",
-                    "format": "",
-                    "url": "",
-                    "envoye": "non",
-                    "_slot": k,
-                })
-        if (not r.get("Heure envoi 1") and not r.get("Heure envoi 2") and not r.get("Heure envoi 3")):
-            skips["sans_heure"] += 1
-
-    dfn = pd.DataFrame(rows)
+    with metrics.timer("planning.expand"):
+        dfn, skips = _expand_planning(dfc, dates_fenetre)
+    metrics.incr("planning.rows_new", len(dfn))
     if dfn.empty:
         print(f"[DEBUG] df_nouveau est vide ; skips={skips}")
     else:
         print(f"[DEBUG] Nouveau par date: {dfn['date'].value_counts().to_dict()}\n[DEBUG] skips={skips}")
 
-    # Read existing planning
-    records = ws_planning.get_all_records()
-    cols_plan = ["client","programme","saison","chat_id","date","heure","type","avancement","message","format","url","envoye"]
+    # Read existing planning (raw values kept for the diff write)
+    old_values = store.read_planning()
+    records = records_from_values(old_values)
+    cols_plan = PLANNING_COLS
     if records:
         dfe = pd.DataFrame(records)
         for c in cols_plan:
@@ -222,42 +365,23 @@ def generer_planning():
         dfe = dfe[dfe["_date_obj"].notna() & (dfe["_date_obj"]>=cutoff)].drop(columns=["_date_obj"])
 
     # Merge & dedup
-    key_cols = ["client","programme","saison","chat_id","date","heure"]
+    key_cols = KEY_COLS
     # NOTE: exclude 'type' from key since it's now filled post-merge
     dfm = pd.concat([dfe, dfn], ignore_index=True)
     dfm.drop_duplicates(subset=key_cols, keep="first", inplace=True)
 
     # ==== Fill messages / type from programme tabs ====
-    # Preload programme tabs
-    cache_prog = {}
-    def get_prog_df(prog):
-        prog = str(prog).zfill(3)
-        if prog in cache_prog:
-            return cache_prog[prog]
-        try:
-            ws = doc_programmes.worksheet(prog)
-            dfp = pd.DataFrame(ws.get_all_records())
-            for c in ["Support","Saison","Jour","Type","Phrase","Format","Url"]:
-                if c not in dfp.columns: dfp[c] = ""
-            dfp["Saison"] = pd.to_numeric(dfp["Saison"], errors="coerce").fillna(1).astype(int)
-            dfp["Jour"] = pd.to_numeric(dfp["Jour"], errors="coerce").fillna(1).astype(int)
-            dfp["Type"] = pd.to_numeric(dfp["Type"], errors="coerce").astype("Int64")
-        except Exception:
-            dfp = pd.DataFrame(columns=["Support","Saison","Jour","Type","Phrase","Format","Url"])
-        cache_prog[prog]=dfp
-        return dfp
+    # Prefetch every referenced programme tab + 'Types' in a single values_batch_get
+    progs = set(dfm["programme"].astype(str).str.zfill(3)) | {p for p in dfc["Programme"] if p}
+    tabs = {t: _tab_records(v) for t, v in store.read_programme_tabs(["Types"] + sorted(progs)).items()}
 
-    # Determine slot position for rows (if _slot missing because it came from existing dfe)
-    def compute_slot_indices(group):
-        # sort by heure then assign slot 1..3
-        temp = group.copy()
-        temp["_slot"] = pd.to_datetime(temp["heure"], format="%H:%M:%S", errors="coerce")
-        temp = temp.sort_values("_slot", kind="stable")
-        temp["_slot"] = range(1, len(temp)+1)
-        return temp["_slot"]
+    # Types mapping from 'Types'
+    types_id_to_label, types_label_to_id = _parse_types(tabs.get("Types"))
+
+    programmes = _ProgrammeCache(tabs)
 
-    if "_slot" not in dfm.columns or dfm["_slot"].isna().any():
-        dfm["_slot"] = dfm.groupby(["client","programme","saison","date"]).apply(compute_slot_indices).reset_index(level=[0,1,2,3], drop=True)
+    # Slots are recomputed for every row as soon as one lacks _slot (it came from the existing planning)
+    recompute_slots = "_slot" not in dfm.columns or dfm["_slot"].isna().any()
 
     # choose type_id per slot: prefer client-specified 'Type envoi k', else DEFAULT_SLOT_TYPE_IDS[k-1]
     def type_id_for_row(r):
@@ -270,38 +394,8 @@ def generer_planning():
         except Exception:
             return None
 
-    labels, messages, formats, urls = [], [], [], []
-    for idx, r in dfm.iterrows():
-        prog = str(r["programme"]).zfill(3)
-        saison = int(pd.to_numeric(r["saison"], errors="coerce") or 1)
-        jour = int(pd.to_numeric(r["avancement"], errors="coerce") or 1)
-        dfp = get_prog_df(prog)
-
-        # pick k-th row for this (saison, jour) sorted by Type id, based on slot
-        k = int(r.get("_slot", 1))
-        subset = dfp[(dfp["Saison"]==saison) & (dfp["Jour"]==jour)].copy()
-        subset = subset.sort_values("Type")
-        rec = subset.iloc[k-1] if len(subset) >= k else None
-
-        if rec is not None and pd.notna(rec.get("Phrase","")) and str(rec.get("Phrase","")) != "":
-            val = pd.to_numeric(rec.get("Type"), errors="coerce")
-            type_id = int(val) if pd.notna(val) else 0
-            label = types_id_to_label.get(type_id, str(type_id))
-            labels.append(label)
-            messages.append(f"Saison {saison} - Jour {jour} : \n{label} : {rec.get('Phrase','')}")
-            fmt = str(rec.get("Format","texte")).strip().lower() or "texte"
-            formats.append(fmt)
-            urls.append(str(rec.get("Url","")))
-        else:
-            labels.append("")
-            messages.append("")
-            formats.append("texte")
-            urls.append("")
-
-    dfm["type"] = labels
-    dfm["message"] = messages
-    dfm["format"] = formats
-    dfm["url"] = urls
+    with metrics.timer("planning.fill"):
+        dfm = _fill_planning(dfm, tabs, types_id_to_label, recompute_slots)
 
     # Sort by date then time (as strings standardized), to avoid tz warnings
     dfm["date_norm"] = dfm["date"].apply(lambda x: pd.to_datetime(x, format="%Y-%m-%d", errors="coerce"))
@@ -311,32 +405,21 @@ def generer_planning():
     # Write
     for c in dfm.columns:
         dfm[c] = dfm[c].astype(str)
-    ws_planning.clear()
-    ws_planning.update([dfm.columns.tolist()] + dfm.values.tolist())
+    new_values = [dfm.columns.tolist()] + dfm.values.tolist()
+    store.write_planning(old_values, new_values, key_cols)
+    metrics.incr("planning.rows_total", len(dfm))
     print(f"[DEBUG] Total par date (après fusion): {dfm['date'].value_counts().to_dict()}\n📅 Mise à jour planning à {datetime.now(tz).strftime('%Y-%m-%d %H:%M:%S %Z')}")
 
     # === Mise à jour "Date de Fin" dans la feuille Clients (si vide) ===
 
-    # 1) S'assurer que la colonne existe
-    header = ws_clients.row_values(1)
-    if "Date de Fin" not in header:
-        all_vals = ws_clients.get_all_values()
-        header.append("Date de Fin")
-        if all_vals:
-            ws_clients.update("A1", [header] + all_vals[1:])
-        else:
-            ws_clients.update("A1", [header])
-        header = ws_clients.row_values(1)
-    date_fin_col_idx = header.index("Date de Fin") + 1  # index 1-based
-
-    # 2) Cache du nombre de jours par (programme, saison)
+    # 1) Cache du nombre de jours par (programme, saison)
     nb_jours_cache = {}
 
     def _nb_jours_for(prog, saison):
         key = (prog, int(saison))
         if key in nb_jours_cache:
             return nb_jours_cache[key]
-        dfp = get_prog_df(prog)  # utilise le cache_prog défini plus haut
+        dfp = programmes.df(prog)  # onglets déjà lus plus haut
         if dfp is None or dfp.empty:
             nb_jours_cache[key] = None
             return None
@@ -350,7 +433,7 @@ def generer_planning():
         nb_jours_cache[key] = nb
         return nb
 
-    # 3) Construire les updates pour chaque client sans "Date de Fin"
+    # 2) Construire les updates pour chaque client sans "Date de Fin"
     updates = []
     for i, (_, r) in enumerate(dfc.iterrows(), start=2):  # lignes sheet = 2..N
         cur_fin = str(r.get("Date de Fin", "")).strip()
@@ -380,34 +463,22 @@ def generer_planning():
         else:
             jours_set = {p.strip().lower() for p in str(jours).replace(";", ",").split(",") if p.strip()}
 
-        # simuler les jours de diffusion depuis la date de démarrage
-        count = 0
-        cur = start_dt.date()
-        last = cur
-        while count < nb:
-            if (not jours_set) or (_weekday_fr(cur) in jours_set):
-                count += 1
-                last = cur
-            cur += timedelta(days=1)
+        # nb-ième jour de diffusion depuis la date de démarrage
+        last = _nth_diffusion_day(start_dt.date(), nb, _diffusion_weekdays(jours_set))
+        if last is None:
+            continue  # aucun jour de diffusion reconnu
 
         updates.append((i, last.strftime("%Y-%m-%d")))
 
-    # 4) Batch update dans la feuille Clients
+    # 3) Écriture groupée dans la feuille Clients (crée la colonne si besoin) ;
+    #    rien à écrire = rien à invalider, le snapshot Clients reste valable
     if updates:
-        data_body = {
-            "valueInputOption": "RAW",
-            "data": [
-                {
-                    "range": f"{config.FEUILLE_CLIENTS}!{gspread.utils.rowcol_to_a1(r, date_fin_col_idx)}",
-                    "values": [[val]],
-                }
-                for (r, val) in updates
-            ],
-        }
-        ws_clients.spreadsheet.values_batch_update(data_body)
+        store.write_client_column("Date de Fin", updates)
         print(f"📝 Dates de fin mises à jour pour {len(updates)} client(s).")
     else:
         print("📝 Aucune date de fin à compléter.")
+    store.close()
 
 if __name__ == "__main__":
-    generer_planning()
+    with metrics.run("planning"):
+        generer_planning()
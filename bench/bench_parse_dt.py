@@ -0,0 +1,76 @@
+"""Benchmark: per-row vs vectorized `date`/`heure` parsing in Script_Bot.
+
+    python bench/bench_parse_dt.py                 # 10k, 100k, 1M lignes
+    python bench/bench_parse_dt.py --sizes 50000 --rowwise-max 0
+
+The per-row path is only timed up to --rowwise-max rows (it takes minutes at
+1M); above that its time is extrapolated linearly from the largest sample.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+import Script_Bot
+
+def make_planning(n, bad_ratio=0.001, seed=0):
+    rnd = random.Random(seed)
+    d0 = date(2024, 1, 1)
+    hours = ["08:00:00", "12:30:00", "19:45:00"]
+    dates, heures = [], []
+    for i in range(n):
+        dates.append((d0 + timedelta(days=i // 3000)).strftime("%Y-%m-%d"))
+        r = rnd.random()
+        if r < bad_ratio:
+            heures.append("8h00")            # fallback path
+        elif r < 2 * bad_ratio:
+            heures.append("")                # date only
+        else:
+            heures.append(hours[i % 3])
+    return pd.DataFrame({"date": dates, "heure": heures})
+
+def rowwise(df):
+    # Previous implementation: one pd.to_datetime per row through DataFrame.apply
+    def mk_dt(row):
+        s = f"{row['date']} {row['heure']}".strip()
+        try:
+            return pd.to_datetime(s, errors="coerce")
+        except Exception:
+            return pd.NaT
+    return df.apply(mk_dt, axis=1)
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return time.perf_counter() - t0, out
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", default="10000,100000,1000000")
+    ap.add_argument("--rowwise-max", type=int, default=20000)
+    args = ap.parse_args()
+
+    print(f"{'lignes':>10} {'par ligne (s)':>15} {'vectorisé (s)':>15} {'gain':>8}")
+    for n in [int(x) for x in args.sizes.split(",") if x]:
+        df = make_planning(n)
+        t_vec, vec = timed(Script_Bot.parse_dt_naive, df["date"], df["heure"])
+
+        m = min(n, args.rowwise_max)
+        if m > 0:
+            t_row, ref = timed(rowwise, df.head(m))
+            same = ref.astype("datetime64[ns]").equals(vec.head(m).astype("datetime64[ns]"))
+            if not same:
+                print(f"⚠️ résultats différents sur {m} lignes")
+            t_row = t_row * n / m
+            note = "" if m == n else " (extrapolé)"
+            print(f"{n:>10} {t_row:>15.3f} {t_vec:>15.3f} {t_row / t_vec:>7.0f}x{note}")
+        else:
+            print(f"{n:>10} {'-':>15} {t_vec:>15.3f} {'-':>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Benchmark: generer_planning + lancer_bot end to end, offline.
+
+    python bench/bench_runs.py                                  # 500 clients, 10 programmes
+    python bench/bench_runs.py --clients 5000 --send-mode async --concurrency 50
+    python bench/bench_runs.py --sheets-latency 0.2 --tg-latency 0.05 --tg-429 0.01
+
+Google Sheets is replaced by an in-memory fake (bench/fakes.py) and
+api.telegram.org by a local HTTP server, both with optional latency and
+injected errors. Every row of today's planning is made due before the bot run.
+Reports wall time, Sheets API calls and Telegram requests / messages per second.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from fakes import FakeSheets, FakeTelegram
+from scenarios import generate
+
+def configure(args, api_base, workdir):
+    # Module-level settings are read at import time: set them before importing the scripts
+    config.STORAGE_BACKEND = "gsheets"
+    config.SHEETS_SESSION_FILE = None  # the fake client needs no credentials
+    config.SNAPSHOT_CACHE_DIR = os.path.join(workdir, "cache") if args.snapshot_cache else None
+    config.OUTBOX_JOURNAL = os.path.join(workdir, "outbox.sqlite") if args.journal else None
+    config.NB_JOURS_GENERATION = args.gen_days
+    config.PLANNING_WRITE_MODE = args.write_mode
+    config.TELEGRAM_API_BASE = api_base
+    config.TELEGRAM_RATE_LIMIT = args.rate_limit
+    config.TELEGRAM_BACKOFF_BASE = args.backoff
+    config.SEND_MODE = args.send_mode
+    config.SEND_CONCURRENCY = args.concurrency
+    config.SEND_FANOUT = not args.no_fanout
+    config.PLANNING_STREAM_ROWS = args.stream_rows
+    config.SEND_ORDER = args.send_order
+    config.SEND_TIME_BUDGET_S = args.budget
+    config.SEND_WINDOW_MINUTES = None
+    config.TELEGRAM_FILE_ID_CACHE = os.path.join(workdir, "file_ids.sqlite") if args.file_id_cache else None
+
+def run(fn, quiet=True):
+    out = io.StringIO()
+    t0 = time.perf_counter()
+    error = None
+    try:
+        with contextlib.redirect_stdout(out) if quiet else contextlib.nullcontext():
+            fn()
+    except Exception as e:
+        error = str(e) if str(e).startswith(type(e).__name__) else f"{type(e).__name__}: {e}"
+    return time.perf_counter() - t0, error
+
+def make_today_due(sheets, tz):
+    """Move every row dated today to 00:00:00 so the bot sends all of them."""
+    ws = sheets.files[config.FICHIER_PLANNING]._tabs[config.FEUILLE_PLANNING]
+    if not ws.values:
+        return 0
+    header = ws.values[0]
+    d, h, e = header.index("date"), header.index("heure"), header.index("envoye")
+    today = datetime.now(tz).strftime("%Y-%m-%d")
+    n = 0
+    for row in ws.values[1:]:
+        if row[d] == today and row[e] == "non":
+            row[h] = "00:00:00"
+            n += 1
+    return n
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--clients", type=int, default=500)
+    ap.add_argument("--programmes", type=int, default=10)
+    ap.add_argument("--days", type=int, default=30, help="ancienneté max des clients / longueur des programmes")
+    ap.add_argument("--gen-days", type=int, default=2, help="NB_JOURS_GENERATION")
+    ap.add_argument("--sheets-latency", type=float, default=0.0, help="secondes par appel Sheets")
+    ap.add_argument("--sheets-errors", type=float, default=0.0, help="part des appels Sheets en erreur 429")
+    ap.add_argument("--tg-latency", type=float, default=0.0, help="secondes par requête Telegram")
+    ap.add_argument("--tg-429", type=float, default=0.0)
+    ap.add_argument("--tg-5xx", type=float, default=0.0)
+    ap.add_argument("--tg-retry-after", type=int, default=0)
+    ap.add_argument("--send-mode", choices=["sync", "async"], default="sync")
+    ap.add_argument("--concurrency", type=int, default=20)
+    ap.add_argument("--no-fanout", action="store_true", help="désactive le regroupement des messages identiques")
+    ap.add_argument("--send-order", choices=["planning", "newest", "edf", "fair"], default="planning")
+    ap.add_argument("--budget", type=float, help="SEND_TIME_BUDGET_S : durée d'envoi max du run bot")
+    ap.add_argument("--rate-limit", action="store_true", help="active la limitation de débit Telegram")
+    ap.add_argument("--backoff", type=float, default=0.05, help="TELEGRAM_BACKOFF_BASE")
+    ap.add_argument("--write-mode", choices=["diff", "full"], default="diff")
+    ap.add_argument("--stream-rows", type=int, help="PLANNING_STREAM_ROWS : lecture du planning par tranches")
+    ap.add_argument("--snapshot-cache", action="store_true")
+    ap.add_argument("--journal", action="store_true", help="active le journal outbox")
+    ap.add_argument("--file-id-cache", action="store_true", help="active le cache url -> file_id des images")
+    ap.add_argument("--runs", type=int, default=2, help="passages de Script_Planning (le 2e relit un planning existant)")
+    ap.add_argument("--verbose", action="store_true", help="affiche la sortie des scripts")
+    ap.add_argument("--json", help="écrit le rapport dans ce fichier")
+    args = ap.parse_args()
+
+    clients, programmes = generate(args.clients, args.programmes, args.days)
+    sheets = FakeSheets({
+        config.FICHIER_CLIENTS: {config.FEUILLE_CLIENTS: clients},
+        config.FICHIER_PLANNING: {config.FEUILLE_PLANNING: []},
+        config.FICHIER_PROGRAMMES: programmes,
+    }, latency=args.sheets_latency, error_rate=args.sheets_errors)
+    sheets.install()
+
+    report = {"scenario": {"clients": args.clients, "programmes": args.programmes, "days": args.days,
+                           "gen_days": args.gen_days, "send_mode": args.send_mode}}
+    with tempfile.TemporaryDirectory() as workdir, \
+            FakeTelegram(args.tg_latency, args.tg_429, args.tg_5xx, args.tg_retry_after) as tg:
+        configure(args, tg.url, workdir)
+        import Script_Planning
+        import Script_Bot
+
+        for i in range(1, args.runs + 1):
+            sheets.calls.clear()
+            wall, error = run(Script_Planning.generer_planning, quiet=not args.verbose)
+            rows = max(0, len(sheets.files[config.FICHIER_PLANNING]._tabs[config.FEUILLE_PLANNING].values) - 1)
+            report[f"planning_run{i}"] = {"wall_s": round(wall, 3), "rows": rows,
+                                          "sheets_calls": dict(sheets.calls), "error": error}
+
+        due = make_today_due(sheets, Script_Bot._tz())
+        sheets.calls.clear()
+        wall, error = run(Script_Bot.lancer_bot, quiet=not args.verbose)
+        Script_Bot.telegram.close()
+        report["bot"] = {
+            "wall_s": round(wall, 3), "due": due, "delivered": tg.delivered,
+            "photo_downloads": tg.photo_downloads,
+            "msg_per_s": round(tg.delivered / wall, 1) if wall > 0 else None,
+            "telegram_requests": {f"{m} {s}": n for (m, s), n in sorted(tg.requests.items())},
+            "client_stats": {k: round(v, 3) for k, v in Script_Bot.telegram.stats.items()},
+            "sheets_calls": dict(sheets.calls), "error": error,
+        }
+    report["sheets_errors_injected"] = sheets.errors
+
+    for name, r in report.items():
+        if name == "scenario" or not isinstance(r, dict):
+            continue
+        calls = sum(r["sheets_calls"].values())
+        line = f"{name:<14} {r['wall_s']:>8.3f}s  appels Sheets={calls:<4}"
+        if name == "bot":
+            line += (f" envoyés={r['delivered']}/{r['due']}  {r['msg_per_s']} msg/s  images téléchargées={r['photo_downloads']}"
+                     f"  requêtes={r['telegram_requests']}")
+        else:
+            line += f" lignes={r['rows']}"
+        if r["error"]:
+            line += f"  ⚠️ {r['error']}"
+        print(line)
+    if sheets.errors:
+        print(f"erreurs 429 Sheets injectées : {sheets.errors}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
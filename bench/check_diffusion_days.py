@@ -0,0 +1,154 @@
+"""Check: Script_Planning's calendar helpers and planning expansion against the day-by-day loops they replaced.
+
+    python bench/check_diffusion_days.py               # 20000 cas aléatoires, 2000 clients
+    python bench/check_diffusion_days.py --cases 100000 --clients 10000 --seed 7
+
+_count_diffusion_days (avancement of a planning date) and _nth_diffusion_day
+(Date de Fin) are compared with the previous loops on random start dates,
+dates, Jours de Diffusion and episode counts. _expand_planning (rows and
+avancement of a whole window) is compared with the previous per-client loop
+on random Clients rows. Exits with status 1 on the first mismatches.
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Script_Planning as SP
+
+def _weekday_fr(d):
+    return SP.JOURS_FR[d.weekday()]
+
+def loop_avancement(start, d, jours):
+    # Previous implementation: count diffusion days from `start`, day by day, up to `d`
+    cnt = 0; adv_by_date = {}
+    cur = start
+    while cur <= d:
+        if len(jours) == 0 or _weekday_fr(cur) in jours:
+            cnt += 1
+        adv_by_date[cur] = cnt
+        cur += timedelta(days=1)
+    return int(adv_by_date.get(d, 0))
+
+def loop_date_fin(start, nb, jours_set):
+    # Previous implementation: walk from `start` until the nb-th diffusion day
+    count = 0
+    cur = start
+    last = cur
+    while count < nb:
+        if (not jours_set) or (_weekday_fr(cur) in jours_set):
+            count += 1
+            last = cur
+        cur += timedelta(days=1)
+    return last
+
+def loop_expand(dfc, dates_fenetre):
+    # Previous implementation of the planning expansion (before _expand_planning)
+    rows = []
+    skips = {"client_vide":0,"canalid_vide":0,"date_invalide":0,"sans_heure":0}
+    for _, r in dfc.iterrows():
+        client_name = str(r["Client"]).strip()
+        chat_id = str(r["Canal ID"]).strip()
+        start = r["Date de Démarrage"]
+        jours = r["Jours de Diffusion"]
+        if not client_name: skips["client_vide"]+=1; continue
+        if not chat_id: skips["canalid_vide"]+=1; continue
+        if pd.isna(start): skips["date_invalide"]+=1; continue
+        for d in dates_fenetre:
+            if len(jours) != 0 and _weekday_fr(d) not in jours:
+                continue
+            adv = loop_avancement(start.date(), d, jours)
+            for k in (1,2,3):
+                h = r.get(f"Heure envoi {k}", "")
+                if not h:
+                    continue
+                rows.append((client_name, str(r["Programme"]).strip(), int(r["Saison"]), chat_id,
+                             d.strftime("%Y-%m-%d"), h, adv, k))
+        if (not r.get("Heure envoi 1") and not r.get("Heure envoi 2") and not r.get("Heure envoi 3")):
+            skips["sans_heure"] += 1
+    return rows, skips
+
+def random_clients(rnd, n, today):
+    def pick(p, value, other=""):
+        return value if rnd.random() >= p else other
+    rows = []
+    for i in range(n):
+        start = today + timedelta(days=rnd.randint(-400, 20))
+        rows.append({
+            "Client": pick(0.03, f"client {i}"),
+            "Canal ID": pick(0.03, str(-1000 - i)),
+            "Programme": f"{rnd.randint(1, 5):03}",
+            "Saison": rnd.randint(1, 3),
+            "Date de Démarrage": pick(0.03, pd.Timestamp(start), pd.NaT),
+            "Jours de Diffusion": SP._parse_jours_diffusion(random_jours(rnd)),
+            **{f"Heure envoi {k}": pick(0.3, f"{7 + 4 * k:02}:00:00") for k in (1, 2, 3)},
+        })
+    return pd.DataFrame(rows)
+
+def check_expand(rnd, n_clients, errors):
+    today = date(2024, 1, 1) + timedelta(days=rnd.randint(0, 730))
+    dates_fenetre = [today + timedelta(days=i) for i in range(rnd.randint(1, 30))]
+    dfc = random_clients(rnd, n_clients, today)
+    dfn, skips = SP._expand_planning(dfc, dates_fenetre)
+    ref, ref_skips = loop_expand(dfc, dates_fenetre)
+    got = [] if dfn.empty else list(zip(dfn["client"], dfn["programme"], dfn["saison"].astype(int), dfn["chat_id"],
+                                        dfn["date"], dfn["heure"], dfn["avancement"].astype(int), dfn["_slot"]))
+    if got != ref:
+        diff = next((f"{a} != {b}" for a, b in zip(got, ref) if a != b), f"{len(got)} != {len(ref)} lignes")
+        errors.append(f"_expand_planning today={today} : {diff}")
+    if skips != ref_skips:
+        errors.append(f"_expand_planning skips today={today} : {skips} != {ref_skips}")
+    return len(ref)
+
+def random_jours(rnd):
+    r = rnd.random()
+    if r < 0.15:
+        return ""                                     # every day
+    days = rnd.sample(SP.JOURS_FR, rnd.randint(1, 7))
+    if r < 0.25:
+        days = [{"lundi": "monday", "samedi": "saturday"}.get(x, x) for x in days]
+    if r < 0.30:
+        days.append("férié")                          # unknown name, ignored
+    return rnd.choice([", ", ";", ","]).join(days)
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--cases", type=int, default=20000)
+    ap.add_argument("--clients", type=int, default=2000, help="lignes Clients pour _expand_planning")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    rnd = random.Random(args.seed)
+    d0 = date(2024, 1, 1)
+    errors = []
+    for _ in range(args.cases):
+        start = d0 + timedelta(days=rnd.randint(0, 730))
+        jours = SP._parse_jours_diffusion(random_jours(rnd))
+        weekdays = SP._diffusion_weekdays(jours)
+
+        d = start + timedelta(days=rnd.randint(-10, 400))
+        got, ref = SP._count_diffusion_days(start, d, weekdays), loop_avancement(start, d, jours)
+        if got != ref:
+            errors.append(f"avancement start={start} date={d} jours={sorted(jours)} : {got} != {ref}")
+
+        nb = rnd.randint(1, 300)
+        if not weekdays:
+            continue  # the old loop never ends when no day name is recognised
+        got, ref = SP._nth_diffusion_day(start, nb, weekdays), loop_date_fin(start, nb, jours)
+        if got != ref:
+            errors.append(f"Date de Fin start={start} nb={nb} jours={sorted(jours)} : {got} != {ref}")
+
+    n_rows = sum(check_expand(rnd, n, errors) for n in (1, 10, args.clients))
+
+    for e in errors[:20]:
+        print(f"⚠️ {e}")
+    print(f"{args.cases} cas, {args.clients} clients ({n_rows} lignes planning), {len(errors)} différence(s)")
+    sys.exit(1 if errors else 0)
+
+if __name__ == "__main__":
+    main()
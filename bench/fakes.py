@@ -0,0 +1,319 @@
+"""In-process stand-ins for Google Sheets (gspread) and the Telegram Bot API.
+
+Only what Script_Planning / Script_Bot / storage.py use is implemented. Every
+call that would hit the network is counted, can be slowed down (`latency`)
+and can fail with a 429 quota error (`error_rate`).
+"""
+import json
+import random
+import re
+import socket
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import gspread
+import requests
+from google.oauth2.service_account import Credentials
+
+# ======================
+# Fake Google Sheets
+# ======================
+
+def _quota_error():
+    resp = requests.Response()
+    resp.status_code = 429
+    resp._content = json.dumps({"error": {
+        "code": 429, "status": "RESOURCE_EXHAUSTED",
+        "message": "Quota exceeded for quota metric 'Read requests' (fake)"}}).encode()
+    return gspread.exceptions.APIError(resp)
+
+def _col_num(letters):
+    n = 0
+    for ch in letters:
+        n = n * 26 + ord(ch) - 64
+    return n
+
+def _parse_range(rng):
+    """"'Tab'!A2:C5" -> (title, r0, c0, r1, c1); bounds are 1-based, None = open."""
+    if "!" in rng:
+        title, cells = rng.rsplit("!", 1)
+    else:
+        title, cells = rng, ""
+    if title.startswith("'") and title.endswith("'"):
+        title = title[1:-1].replace("''", "'")
+    if not cells:
+        return title, None, None, None, None
+    a, _, b = cells.partition(":")
+    bounds = []
+    for part in (a, b or a):
+        m = re.fullmatch(r"([A-Z]*)(\d*)", part)
+        bounds.append((int(m.group(2)) if m.group(2) else None, _col_num(m.group(1)) if m.group(1) else None))
+    (r0, c0), (r1, c1) = bounds
+    return title, r0, c0, r1, c1
+
+class FakeWorksheet:
+    def __init__(self, sheets, spreadsheet, title, values, sheet_id):
+        self._sheets = sheets
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.id = sheet_id
+        self.values = [[str(v) for v in r] for r in values]
+
+    def get_all_values(self, **kw):
+        self._sheets._api("get_all_values")
+        width = max((len(r) for r in self.values), default=0)
+        return [r + [""] * (width - len(r)) for r in self.values]
+
+    def row_values(self, row):
+        self._sheets._api("row_values")
+        return list(self.values[row - 1]) if len(self.values) >= row else []
+
+    def update(self, a, b=None, **kw):
+        self._sheets._api("update")
+        rng, values = (a, b) if isinstance(a, str) else (b or "A1", a)
+        _, r0, c0, _, _ = _parse_range(rng)
+        self._put(r0 or 1, c0 or 1, values)
+
+    def clear(self):
+        self._sheets._api("clear")
+        self.values = []
+        self.spreadsheet._touch()
+
+    def hide(self):
+        self._sheets._api("hide")
+
+    def _put(self, r0, c0, rows):
+        for i, row in enumerate(rows):
+            while len(self.values) < r0 + i:
+                self.values.append([])
+            line = self.values[r0 - 1 + i]
+            for j, v in enumerate(row):
+                while len(line) < c0 + j:
+                    line.append("")
+                line[c0 - 1 + j] = "" if v is None else str(v)
+        self.spreadsheet._touch()
+
+    def _get(self, r0, c0, r1, c1):
+        # Sheets API semantics: trailing empty rows / cells are not returned
+        rows = self.values[(r0 or 1) - 1:r1]
+        out = [r[(c0 or 1) - 1:c1] for r in rows]
+        for r in out:
+            while r and r[-1] == "":
+                r.pop()
+        while out and not out[-1]:
+            out.pop()
+        return out
+
+class FakeSpreadsheet:
+    def __init__(self, sheets, title, tabs):
+        self._sheets = sheets
+        self.title = title
+        self._tabs = {}
+        self._modified = 0
+        for t, values in tabs.items():
+            self._tabs[t] = FakeWorksheet(sheets, self, t, values, len(self._tabs))
+
+    def _touch(self):
+        self._modified += 1
+
+    def worksheet(self, title):
+        self._sheets._api("worksheet")
+        if title not in self._tabs:
+            raise gspread.exceptions.WorksheetNotFound(title)
+        return self._tabs[title]
+
+    def worksheets(self):
+        self._sheets._api("worksheets")
+        return list(self._tabs.values())
+
+    def add_worksheet(self, title, rows=100, cols=26, index=None):
+        self._sheets._api("add_worksheet")
+        ws = self._tabs[title] = FakeWorksheet(self._sheets, self, title, [], len(self._tabs))
+        return ws
+
+    def fetch_sheet_metadata(self, params=None):
+        self._sheets._api("fetch_sheet_metadata")
+        return {"sheets": [{"properties": {"title": t, "sheetId": ws.id,
+                                           "gridProperties": {"rowCount": max(len(ws.values), 1)}}}
+                           for t, ws in self._tabs.items()]}
+
+    def get_lastUpdateTime(self):
+        self._sheets._api("drive_modified_time")
+        return f"2024-01-01T00:00:00.{self._modified:06d}Z"
+
+    def values_batch_get(self, ranges, params=None):
+        self._sheets._api("values_batch_get")
+        out = []
+        for rng in ranges:
+            title, r0, c0, r1, c1 = _parse_range(rng)
+            out.append({"range": rng, "values": self._tabs[title]._get(r0, c0, r1, c1)})
+        return {"valueRanges": out}
+
+    def values_batch_update(self, body):
+        self._sheets._api("values_batch_update")
+        for d in body["data"]:
+            title, r0, c0, _, _ = _parse_range(d["range"])
+            self._tabs[title]._put(r0 or 1, c0 or 1, d["values"])
+
+    def values_batch_clear(self, ranges, body=None):
+        self._sheets._api("values_batch_clear")
+        for rng in ranges:
+            title, r0, c0, r1, c1 = _parse_range(rng)
+            ws = self._tabs[title]
+            for line in ws.values[(r0 or 1) - 1:r1]:
+                for c in range((c0 or 1) - 1, min(c1 or len(line), len(line))):
+                    line[c] = ""
+            while ws.values and not any(ws.values[-1]):
+                ws.values.pop()
+        self._touch()
+
+    def batch_update(self, body):
+        self._sheets._api("batch_update")
+        by_id = {ws.id: ws for ws in self._tabs.values()}
+        for req in body["requests"]:
+            (kind, spec), = req.items()
+            if kind == "deleteDimension":
+                rg = spec["range"]
+                del by_id[rg["sheetId"]].values[rg["startIndex"]:rg["endIndex"]]
+            elif kind == "insertDimension":
+                rg = spec["range"]
+                ws = by_id[rg["sheetId"]]
+                for _ in range(rg["endIndex"] - rg["startIndex"]):
+                    ws.values.insert(rg["startIndex"], [])
+            elif kind == "updateCells":
+                st = spec["start"]
+                rows = [[c.get("userEnteredValue", {}).get("stringValue", "") for c in row["values"]]
+                        for row in spec["rows"]]
+                by_id[st["sheetId"]]._put(st["rowIndex"] + 1, st["columnIndex"] + 1, rows)
+            else:
+                raise NotImplementedError(kind)
+        self._touch()
+
+class FakeSheets:
+    """In-memory gspread client: {spreadsheet name: {tab title: values}}."""
+
+    def __init__(self, files, latency=0.0, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.calls = Counter()
+        self.errors = 0
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        self.files = {name: FakeSpreadsheet(self, name, tabs) for name, tabs in files.items()}
+
+    def _api(self, method):
+        with self._lock:
+            self.calls[method] += 1
+            fail = self._rnd.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise _quota_error()
+
+    def open(self, name):
+        self._api("open")
+        if name not in self.files:
+            raise gspread.exceptions.SpreadsheetNotFound(name)
+        return self.files[name]
+
+    def install(self):
+        """Route gspread.authorize() (and the service-account file) to this fake."""
+        Credentials.from_service_account_file = staticmethod(lambda *a, **k: None)
+        gspread.authorize = lambda creds, *a, **k: self
+
+# ======================
+# Fake Telegram Bot API
+# ======================
+
+class FakeTelegram:
+    """Local HTTP server answering sendMessage / sendPhoto like api.telegram.org.
+
+    `rate_429` / `rate_5xx` are the share of requests answered with a 429
+    (carrying `retry_after`) or a 502.
+    """
+
+    def __init__(self, latency=0.0, rate_429=0.0, rate_5xx=0.0, retry_after=1, seed=0):
+        self.latency = latency
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.retry_after = retry_after
+        self.requests = Counter()   # (method, status)
+        self.delivered = 0
+        self.photo_downloads = 0    # sendPhoto given a URL (Telegram would fetch the image)
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"   # keep-alive, like the real API
+
+            def setup(self):
+                super().setup()
+                # headers and body go out in two writes: without this, Nagle + delayed ACK add ~40 ms
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                status, payload = fake._answer(self.path.rsplit("/", 1)[-1], parse_qs(body.decode()))
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _answer(self, method, form):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            r = self._rnd.random()
+            if r < self.rate_429:
+                status = 429
+            elif r < self.rate_429 + self.rate_5xx:
+                status = 502
+            else:
+                status = 200
+                self.delivered += 1
+                message_id = self.delivered
+            self.requests[(method, status)] += 1
+        if status == 429:
+            return 429, {"ok": False, "error_code": 429,
+                         "description": f"Too Many Requests: retry after {self.retry_after}",
+                         "parameters": {"retry_after": self.retry_after}}
+        if status == 502:
+            return 502, {"ok": False, "error_code": 502, "description": "Bad Gateway"}
+        result = {"message_id": message_id, "chat": {"id": form.get("chat_id", [""])[0]}}
+        if method == "sendPhoto":
+            photo = form.get("photo", [""])[0]
+            if photo.startswith("http"):
+                with self._lock:
+                    self.photo_downloads += 1
+            result["photo"] = [{"file_id": "fake-" + str(abs(hash(photo))), "file_unique_id": str(abs(hash(photo)))}]
+        return 200, {"ok": True, "result": result}
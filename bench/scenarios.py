@@ -0,0 +1,43 @@
+"""Synthetic Clients / programme sheets for the benchmarks.
+
+    clients, programmes = generate(n_clients=1000, n_programmes=10, n_days=60)
+"""
+import random
+from datetime import date, timedelta
+
+JOURS = ["lundi", "mardi", "mercredi", "jeudi", "vendredi", "samedi", "dimanche"]
+CLIENT_HEADER = ["Client", "Thème", "Canal ID", "Programme", "Saison", "Date de Démarrage",
+                 "Jours de Diffusion", "Heure envoi 1", "Heure envoi 2", "Heure envoi 3", "Date de Fin"]
+PROG_HEADER = ["Support", "Saison", "Jour", "Type", "Phrase", "Format", "Url"]
+
+def generate(n_clients=100, n_programmes=5, n_days=30, image_ratio=0.2, seed=0, today=None):
+    """Return (clients values, {tab title: values}) for the Clients and programme spreadsheets.
+
+    Clients started within the last `n_days`; each programme holds n_days + 7
+    days x 2 seasons x 3 types, so every generated row gets a message.
+    """
+    rnd = random.Random(seed)
+    today = today or date.today()
+    hours = ["07:30:00", "08:00:00", "12:00:00", "18:45:00", "21:00:00"]
+
+    clients = [CLIENT_HEADER]
+    for i in range(n_clients):
+        start = today - timedelta(days=rnd.randint(0, n_days))
+        jours = ", ".join(rnd.sample(JOURS, rnd.randint(3, 7)))
+        slots = sorted(rnd.sample(hours, 3))
+        chat = f"-100{1000000 + i}" if i % 3 == 0 else str(100000 + i)
+        clients.append([f"client{i}", "bench", chat, str(rnd.randint(1, n_programmes)), str(rnd.randint(1, 2)),
+                        start.strftime("%d/%m/%Y"), jours] + slots + [""])
+
+    programmes = {"Types": [["Id", "Type"], [1, "Aphorisme"], [2, "Conseil"], [3, "Réflexion"]]}
+    for p in range(1, n_programmes + 1):
+        rows = [PROG_HEADER]
+        for saison in (1, 2):
+            for jour in range(1, n_days + 8):
+                for t in (1, 2, 3):
+                    image = rnd.random() < image_ratio
+                    rows.append(["bench", saison, jour, t, f"Programme {p} saison {saison} jour {jour} type {t}",
+                                 "image" if image else "texte",
+                                 f"https://img.example/{p:03}/{jour % 10}.png" if image else ""])
+        programmes[f"{p:03}"] = rows
+    return clients, programmes
@@ -14,13 +14,46 @@ FEUILLE_PLANNING = "Planning"
 
 # === API Telegram ===
 TELEGRAM_TOKEN = os.environ.get('TELEGRAM_TOKEN', 'VOTRE_TOKEN_PAR_DEFAUT')
+TELEGRAM_API_BASE = None     # None = https://api.telegram.org ; sinon serveur Bot API local ou faux serveur (bench/)
+
+# === 🚀 Envoi Telegram
+SEND_MODE = "sync"           # "sync" (ligne par ligne) | "async" (pool borné de requêtes en vol)
+SEND_CONCURRENCY = 20        # nb max de requêtes Telegram simultanées en mode async
+SEND_FANOUT = True           # regroupe les messages identiques (même texte/image) : encodés une fois, envoyés à tous leurs chats
+SEND_ORDER = "planning"      # ordre d'envoi des messages dus : "planning" | "newest" (plus récents d'abord) | "edf" (plus anciens d'abord) | "fair" (tour de rôle par chat)
+SEND_STALE_MINUTES = None    # retard (min) au-delà duquel un message est périmé ; None = jamais
+SEND_STALE_ACTION = "defer"  # message périmé : "defer" (envoyé après les autres) | "drop" (non envoyé, envoye=expire)
+SEND_TIME_BUDGET_S = None    # durée max d'envoi par run (s) ; le reste reste envoye=non pour le run suivant
+TELEGRAM_RATE_LIMIT = True   # cadence les envois avant d'atteindre les limites Telegram
+TELEGRAM_RATE_GLOBAL = 30    # msg/s au total
+TELEGRAM_RATE_PER_CHAT = 1   # msg/s par chat privé
+TELEGRAM_RATE_PER_GROUP = 20 # msg/min par groupe ou canal (chat_id négatif)
+TELEGRAM_POOL_SIZE = 20      # connexions keep-alive gardées vers api.telegram.org
+TELEGRAM_BACKOFF_BASE = 1.0  # backoff exponentiel (base x 2^n) + jitter entre les tentatives
+TELEGRAM_FILE_ID_CACHE = "file_ids.sqlite"  # url d'image -> file_id Telegram, réutilisé aux envois suivants ; None = désactivé
+TELEGRAM_FILE_ID_TTL = 24 * 3600  # secondes : au-delà, l'image est retéléchargée (si elle a changé derrière la même URL) ; None = jamais
+OUTBOX_JOURNAL = "outbox.sqlite"  # journal local des envois (anti-doublons après crash) ; None = désactivé
+DAEMON_REFRESH_MINUTES = 15  # mode démon (Script_Bot.py --daemon) : relecture du planning
+DAEMON_RETRY_SECONDS = 60  # mode démon : délai avant de réessayer un envoi, une lecture ou une écriture échoués (x2 à chaque échec)
+
+# === 🗄️ Stockage
+STORAGE_BACKEND = "gsheets"  # "gsheets" (lecture/écriture directe) | "sqlite" (copie locale indexée)
+SQLITE_STORE = "planning.sqlite"  # base locale si STORAGE_BACKEND = "sqlite" (python storage.py sync)
+PLANNING_DUE_READ = "window"  # "window" : le bot ne lit que les lignes des jours à envoyer (onglet d'index) ; "full" : tout le planning
+PLANNING_INDEX_SHEET = "_index"  # onglet masqué du fichier planning : date -> première/dernière ligne
+PLANNING_STREAM_ROWS = None  # ex. 5000 : le bot lit le planning par tranches de N lignes (mémoire constante) ; None = en un bloc
+SHEETS_SESSION_FILE = ".sheets_session.json"  # jeton d'accès + ids des fichiers/onglets réutilisés d'un run à l'autre ; None = désactivé
+SHEETS_SESSION_TTL = 6 * 3600  # secondes avant de revérifier ids et onglets (supprimer le fichier après avoir recréé un onglet)
+SNAPSHOT_CACHE_DIR = ".sheets_cache"  # copie disque des feuilles, relue seulement si le fichier Drive a changé ; None = désactivé
 
 
 # === ⏱️ Autres paramètres
 NB_JOURS_GENERATION = 2      # Nombre de jours de planning à générer
 RETENTION_JOURS = 2          # garde J-2 (purge plus vieux)
+PLANNING_WRITE_MODE = "diff" # "diff" : n'écrit que les lignes/cellules modifiées ; "full" : réécriture complète
 GSHEETS_MAX_RETRIES = 5
 GSHEETS_RETRY_BASE = 1.5     # exponentiel (1.5^n) + jitter
+WRITEBACK_MAX_CELLS = 10000  # cellules max par requête d'écriture (envoye, Date de Fin) ; au-delà, plusieurs requêtes
 
 FUSEAU_HORAIRE = "Europe/Paris"
 LANGUE = "fr_FR.UTF-8"
@@ -28,3 +61,5 @@ LANGUE = "fr_FR.UTF-8"
 # === 📓 Logger / erreurs
 ACTIVER_LOG = True
 FICHIER_LOG = "journal_erreurs.log"
+METRICS_FILE = "metrics.jsonl"   # rapport de chaque run (durées, appels, retries, octets) en JSON-lines ; None = désactivé
+METRICS_PROM_DIR = None          # dossier du textfile collector Prometheus (node_exporter) ; None = pas d'export
@@ -0,0 +1,145 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import config
+
+# ========= Parameters =========
+
+METRICS_FILE = getattr(config, "METRICS_FILE", "metrics.jsonl")      # rapport JSON-lines ; None = désactivé
+METRICS_PROM_DIR = getattr(config, "METRICS_PROM_DIR", None)         # dossier textfile collector Prometheus
+ACTIVER_LOG = getattr(config, "ACTIVER_LOG", False)
+FICHIER_LOG = getattr(config, "FICHIER_LOG", "journal_erreurs.log")
+
+# ========= Registry =========
+# Process-wide and thread-safe: the async send pool records from worker threads.
+
+_lock = threading.Lock()
+_timers = {}     # name -> [count, total_s, max_s]
+_counters = {}   # name -> value
+_started = time.time()
+
+logger = logging.getLogger("meta-bot")
+if ACTIVER_LOG and FICHIER_LOG and not logger.handlers:
+    _handler = logging.FileHandler(FICHIER_LOG, encoding="utf-8", delay=True)
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+def observe(name, seconds):
+    with _lock:
+        t = _timers.setdefault(name, [0, 0.0, 0.0])
+        t[0] += 1
+        t[1] += seconds
+        t[2] = max(t[2], seconds)
+
+@contextmanager
+def timer(name):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - t0)
+
+def timed(name):
+    """Decorator form of timer()."""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+def incr(name, n=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+def json_size(values):
+    """Approximate payload size (bytes) of sheet values, as JSON on the wire."""
+    return len(json.dumps(values, ensure_ascii=False, default=str).encode("utf-8"))
+
+def reset():
+    global _started
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+        _started = time.time()
+
+def snapshot():
+    with _lock:
+        return {
+            "timers": {k: {"count": c, "total_s": round(tot, 6), "max_s": round(mx, 6)}
+                       for k, (c, tot, mx) in sorted(_timers.items())},
+            "counters": dict(sorted(_counters.items())),
+        }
+
+# ========= Export =========
+
+def _prom_name(name):
+    return "".join(ch if ch.isalnum() else "_" for ch in name)
+
+def _write_prom(record):
+    # One file per script, replaced atomically (node_exporter textfile collector)
+    script = record["script"]
+    lines = [
+        "# TYPE metabot_run_duration_seconds gauge",
+        f'metabot_run_duration_seconds{{script="{script}"}} {record["duration_s"]}',
+        "# TYPE metabot_run_timestamp_seconds gauge",
+        f'metabot_run_timestamp_seconds{{script="{script}"}} {record["end_unix"]}',
+        "# TYPE metabot_run_failed gauge",
+        f'metabot_run_failed{{script="{script}"}} {1 if record["error"] else 0}',
+        "# TYPE metabot_timer_seconds gauge",
+    ]
+    for k, t in record["timers"].items():
+        lines.append(f'metabot_timer_seconds{{script="{script}",name="{_prom_name(k)}"}} {t["total_s"]}')
+    lines.append("# TYPE metabot_timer_count gauge")
+    for k, t in record["timers"].items():
+        lines.append(f'metabot_timer_count{{script="{script}",name="{_prom_name(k)}"}} {t["count"]}')
+    lines.append("# TYPE metabot_counter gauge")
+    for k, v in record["counters"].items():
+        lines.append(f'metabot_counter{{script="{script}",name="{_prom_name(k)}"}} {v}')
+    os.makedirs(METRICS_PROM_DIR, exist_ok=True)
+    path = os.path.join(METRICS_PROM_DIR, f"metabot_{_prom_name(script)}.prom")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(path + ".tmp", path)
+
+def emit(script, error=None):
+    """Write the run report (JSON line + optional Prometheus textfile), then reset."""
+    end = time.time()
+    record = {
+        "ts": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "script": script,
+        "duration_s": round(end - _started, 3),
+        "end_unix": int(end),
+        "error": error,
+        **snapshot(),
+    }
+    try:
+        if METRICS_FILE:
+            with open(METRICS_FILE, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        if METRICS_PROM_DIR:
+            _write_prom(record)
+    except OSError as e:
+        print(f"⚠️ Rapport de métriques non écrit : {e}")
+    reset()
+    return record
+
+@contextmanager
+def run(script):
+    """Measure a whole run; failures are logged (ACTIVER_LOG) and reported, then re-raised."""
+    reset()
+    try:
+        yield
+    except BaseException as e:
+        if not isinstance(e, KeyboardInterrupt):
+            logger.exception(f"{script} : échec du run")
+        emit(script, error=f"{type(e).__name__}: {e}")
+        raise
+    emit(script)
@@ -0,0 +1,70 @@
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from storage import KEY_COLS
+
+class OutboxJournal:
+    """Local append-only journal of delivered messages (SQLite).
+
+    Each successful send is recorded as it happens, keyed by the planning
+    row's natural key (client, programme, saison, chat_id, date, heure).
+    `synced` flips to 1 once the matching envoye=oui is written to Sheets,
+    so a crash between the send and the write-back never causes a resend.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(f"""
+            CREATE TABLE IF NOT EXISTS sent (
+                {", ".join(f"{c} TEXT NOT NULL" for c in KEY_COLS)},
+                sent_at TEXT NOT NULL,
+                synced INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY ({", ".join(KEY_COLS)})
+            )""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS sent_pending ON sent (synced)")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def record(self, key):
+        """Journal one delivered message (committed immediately)."""
+        now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        with self._lock:
+            self._db.execute(
+                f"INSERT OR IGNORE INTO sent ({', '.join(KEY_COLS)}, sent_at) VALUES ({', '.join('?' * (len(KEY_COLS) + 1))})",
+                (*[str(k) for k in key], now),
+            )
+
+    def sent_keys(self, keys):
+        """Subset of `keys` already delivered."""
+        keys = [tuple(str(k) for k in key) for key in keys]
+        if not keys:
+            return set()
+        dates = sorted({k[KEY_COLS.index("date")] for k in keys})
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {', '.join(KEY_COLS)} FROM sent WHERE date IN ({', '.join('?' * len(dates))})",
+                dates,
+            ).fetchall()
+        known = set(rows)
+        return {k for k in keys if k in known}
+
+    def mark_synced(self, keys):
+        keys = [tuple(str(k) for k in key) for key in keys]
+        if not keys:
+            return
+        where = " AND ".join(f"{c} = ?" for c in KEY_COLS)
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany(f"UPDATE sent SET synced = 1 WHERE {where}", keys)
+            self._db.execute("COMMIT")
+
+    def purge(self, before_date):
+        """Drop synced entries whose planning date is older than `before_date` (YYYY-MM-DD)."""
+        with self._lock:
+            self._db.execute("DELETE FROM sent WHERE synced = 1 AND date < ?", (before_date,))
@@ -0,0 +1,121 @@
+import json
+import os
+import time
+from datetime import datetime
+import config
+import metrics
+
+# ========= Parameters =========
+
+SHEETS_SESSION_FILE = getattr(config, "SHEETS_SESSION_FILE", ".sheets_session.json")  # None = désactivé
+SHEETS_SESSION_TTL = getattr(config, "SHEETS_SESSION_TTL", 6 * 3600)  # secondes, ids + métadonnées des onglets
+SCOPES = [
+    "https://spreadsheets.google.com/feeds",
+    "https://www.googleapis.com/auth/drive",
+]
+EXPIRY_FORMAT = "%Y-%m-%dT%H:%M:%S"  # naive UTC, as google-auth keeps it
+
+class SheetsSession:
+    """Google Sheets state kept on disk between runs and scripts.
+
+    - the OAuth access token, reused until it expires (no token request);
+    - per spreadsheet name: its id and properties, and the properties of the
+      tabs opened so far, reused for SHEETS_SESSION_TTL seconds (no Drive
+      search, no metadata fetch).
+
+    The file holds a live access token: it is written readable by the owner only.
+    Tab ids are cached too; after deleting / recreating a tab by hand, delete
+    the file (or wait for the TTL).
+    """
+
+    def __init__(self, path=None, ttl=None):
+        self.path = path or SHEETS_SESSION_FILE
+        self.ttl = SHEETS_SESSION_TTL if ttl is None else ttl
+        self.data = {"token": None, "docs": {}}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.data.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+
+    def _save(self):
+        tmp = self.path + ".tmp"
+        try:
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.data, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"⚠️ Session Google Sheets non enregistrée : {e}")
+
+    # --- credentials ---
+
+    def credentials(self, key_file):
+        """Service-account credentials holding a valid access token."""
+        from google.auth.transport.requests import Request
+        from google.oauth2.service_account import Credentials
+        creds = Credentials.from_service_account_file(key_file, scopes=SCOPES)
+        cached = self.data.get("token") or {}
+        if cached.get("account") == creds.service_account_email and cached.get("token"):
+            creds.token = cached["token"]
+            creds.expiry = datetime.strptime(cached["expiry"], EXPIRY_FORMAT)
+        if creds.valid:
+            metrics.incr("sheets.token_reused")
+            return creds
+        with metrics.timer("sheets.token"):
+            creds.refresh(Request())
+        self.data["token"] = {"account": creds.service_account_email, "token": creds.token,
+                              "expiry": creds.expiry.strftime(EXPIRY_FORMAT)}
+        self._save()
+        return creds
+
+    def client(self, key_file):
+        import gspread
+        return gspread.authorize(self.credentials(key_file))
+
+    # --- spreadsheets / tabs ---
+
+    def _entry(self, name):
+        entry = self.data["docs"].get(name)
+        if entry and time.time() - entry.get("at", 0) < self.ttl:
+            return entry
+        return None
+
+    def open(self, client, name):
+        """client.open(name), from the cached id and properties when fresh."""
+        import gspread
+        if not isinstance(client, gspread.Client):
+            return client.open(name)
+        entry = self._entry(name)
+        if entry is not None:
+            # same object as Spreadsheet.__init__ builds, minus its metadata fetch
+            doc = gspread.Spreadsheet.__new__(gspread.Spreadsheet)
+            doc.client = client.http_client
+            doc._properties = dict(entry["properties"])
+            metrics.incr("sheets.session_hit")
+            return doc
+        doc = client.open(name)
+        self.data["docs"][name] = {"at": time.time(), "properties": dict(doc._properties), "tabs": {}}
+        self._save()
+        return doc
+
+    def worksheet(self, doc, name, title):
+        """doc.worksheet(title), from the cached tab properties when fresh."""
+        import gspread
+        if not isinstance(doc, gspread.Spreadsheet):
+            return doc.worksheet(title)
+        entry = self._entry(name)
+        props = entry["tabs"].get(title) if entry is not None else None
+        if props is not None:
+            metrics.incr("sheets.session_hit")
+            return gspread.Worksheet(doc, dict(props), doc.id, doc.client)
+        ws = doc.worksheet(title)
+        if entry is not None:
+            entry["tabs"][title] = dict(ws._properties)
+            self._save()
+        return ws
+
+    def forget(self, name):
+        """Drop what is cached for spreadsheet `name` (its tabs changed)."""
+        if self.data["docs"].pop(name, None) is not None:
+            self._save()
@@ -0,0 +1,775 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import config
+import metrics
+import writeback
+from sheets_session import SHEETS_SESSION_FILE, SheetsSession
+
+# ========= Parameters =========
+
+STORAGE_BACKEND = getattr(config, "STORAGE_BACKEND", "gsheets")   # "gsheets" | "sqlite"
+SQLITE_STORE = getattr(config, "SQLITE_STORE", "planning.sqlite")
+PLANNING_WRITE_MODE = getattr(config, "PLANNING_WRITE_MODE", "diff")  # "diff" | "full"
+SNAPSHOT_CACHE_DIR = getattr(config, "SNAPSHOT_CACHE_DIR", ".sheets_cache")  # None = pas de cache
+PLANNING_DUE_READ = getattr(config, "PLANNING_DUE_READ", "window")  # "window" | "full"
+PLANNING_INDEX_SHEET = getattr(config, "PLANNING_INDEX_SHEET", "_index")
+
+PLANNING_COLS = ["client","programme","saison","chat_id","date","heure","type","avancement","message","format","url","envoye"]
+KEY_COLS = ["client","programme","saison","chat_id","date","heure"]
+
+# ========= Helpers =========
+
+def col_idx_to_a1(idx1):
+    # idx1 is 1-based index -> column letters (A, B, ... AA, AB ...)
+    s = ""
+    while idx1 > 0:
+        idx1, rem = divmod(idx1 - 1, 26)
+        s = chr(65 + rem) + s
+    return s
+
+def records_from_values(values):
+    """Same output as Worksheet.get_all_records() for raw `values` (header on row 1)."""
+    import gspread
+    if not values:
+        return []
+    values = gspread.utils.fill_gaps(values)
+    keys = values[0]
+    if len(keys) != len(set(keys)):
+        raise gspread.exceptions.GSpreadException("the header row in the worksheet is not unique")
+    return gspread.utils.to_records(keys, [gspread.utils.numericise_all(r) for r in values[1:]])
+
+def _quote(title):
+    return "'" + title.replace("'", "''") + "'"
+
+def _row_block(sheet_id, row_index, col_index, rows):
+    return {"updateCells": {
+        "start": {"sheetId": sheet_id, "rowIndex": row_index, "columnIndex": col_index},
+        "rows": [{"values": [{"userEnteredValue": {"stringValue": str(v)}} for v in r]} for r in rows],
+        "fields": "userEnteredValue",
+    }}
+
+def _runs(indices):
+    """Sorted ints -> [(start, end_exclusive)] of consecutive values."""
+    out = []
+    for i in indices:
+        if out and out[-1][1] == i:
+            out[-1][1] = i + 1
+        else:
+            out.append([i, i + 1])
+    return [tuple(r) for r in out]
+
+def _diff_requests(sheet_id, old, new, key_cols):
+    """batchUpdate requests turning sheet values `old` into `new`.
+
+    Rows are matched on key_cols. Returns None when a plain rewrite is needed
+    (different header, duplicate keys, or surviving rows reordered).
+    """
+    if not old or not new or old[0] != new[0]:
+        return None
+    header = new[0]
+    if any(c not in header for c in key_cols):
+        return None
+    width = len(header)
+    pos = [header.index(c) for c in key_cols]
+
+    def pad(r):
+        r = [str(v) for v in r[:width]]
+        return r + [""] * (width - len(r))
+
+    old_rows = [pad(r) for r in old[1:]]
+    new_rows = [pad(r) for r in new[1:]]
+    old_keys = [tuple(r[i] for i in pos) for r in old_rows]
+    new_keys = [tuple(r[i] for i in pos) for r in new_rows]
+    if len(set(old_keys)) != len(old_keys) or len(set(new_keys)) != len(new_keys):
+        return None
+    old_at = {k: i for i, k in enumerate(old_keys)}
+    new_set = set(new_keys)
+
+    survivors = [k for k in old_keys if k in new_set]
+    if survivors != [k for k in new_keys if k in old_at]:
+        return None
+
+    requests = []
+    # 1) deleted rows, bottom-up so indices stay valid (sheet row index = data index + 1)
+    deleted = [i for i, k in enumerate(old_keys) if k not in new_set]
+    for start, end in reversed(_runs(deleted)):
+        requests.append({"deleteDimension": {"range": {
+            "sheetId": sheet_id, "dimension": "ROWS", "startIndex": start + 1, "endIndex": end + 1}}})
+
+    # 2) new rows, top-down: rows above the insertion point already match `new`
+    added = [i for i, k in enumerate(new_keys) if k not in old_at]
+    for start, end in _runs(added):
+        requests.append({"insertDimension": {
+            "range": {"sheetId": sheet_id, "dimension": "ROWS", "startIndex": start + 1, "endIndex": end + 1},
+            "inheritFromBefore": start > 0}})
+        requests.append(_row_block(sheet_id, start + 1, 0, new_rows[start:end]))
+
+    # 3) changed cells of kept rows, one span per row
+    for i, k in enumerate(new_keys):
+        j = old_at.get(k)
+        if j is None:
+            continue
+        changed = [c for c in range(width) if old_rows[j][c] != new_rows[i][c]]
+        if changed:
+            lo, hi = changed[0], changed[-1] + 1
+            requests.append(_row_block(sheet_id, i + 1, lo, [new_rows[i][lo:hi]]))
+    return requests
+
+def _date_index(values):
+    """Rows of the planning index tab for sorted planning `values`.
+
+    One [date, first_row, last_row] line per date plus ["_fin", last_row, ""]
+    for the whole table. Only the header is returned when the dates are not
+    sorted, which sends readers back to the full read.
+    """
+    rows = [["date", "first", "last"]]
+    header = values[0] if values else []
+    if "date" not in header:
+        return rows
+    p = header.index("date")
+    spans, prev, undated = {}, "", False
+    for r, row in enumerate(values[1:], start=2):
+        d = str(row[p]).strip() if p < len(row) else ""
+        if not d:
+            undated = True   # undated rows are sorted last
+            continue
+        if d < prev or undated:
+            return rows
+        spans.setdefault(d, [r, r])[1] = r
+        prev = d
+    rows += [[d, f, l] for d, (f, l) in spans.items()]
+    rows.append(["_fin", len(values), ""])
+    return rows
+
+def _trimmed(values):
+    """Cells as strings, without trailing blank cells and rows (as Sheets returns them)."""
+    rows = [[str(c) for c in r] for r in values]
+    for r in rows:
+        while r and r[-1] == "":
+            r.pop()
+    while rows and not rows[-1]:
+        rows.pop()
+    return rows
+
+def _parse_date_index(values):
+    """Index tab values -> (last_row, {date: (first, last)}), None if unusable."""
+    try:
+        end, spans = None, {}
+        for row in values[1:]:
+            if row and row[0] == "_fin":
+                end = int(row[1])
+            elif row and row[0]:
+                spans[row[0]] = (int(row[1]), int(row[2]))
+    except (IndexError, ValueError):
+        return None
+    if end is None:
+        return None
+    return end, spans
+
+# ========= Interface =========
+
+class PlanningStore:
+    """Storage used by Script_Planning and Script_Bot.
+
+    Tables travel as sheet-like values: a list of rows, header first.
+    Planning rows are addressed by a row id (the sheet row number for
+    Google Sheets) so sent marks can be written back.
+    """
+
+    def read_clients(self):
+        """Values of the Clients sheet."""
+        raise NotImplementedError
+
+    def write_client_column(self, column, updates):
+        """Create `column` in Clients if needed, then write [(row, value)] into it."""
+        raise NotImplementedError
+
+    def programme_titles(self):
+        """Names of every programme tab (including 'Types')."""
+        raise NotImplementedError
+
+    def read_programme_tabs(self, titles):
+        """{title: values} for the programme tabs that exist among `titles`."""
+        raise NotImplementedError
+
+    def read_planning(self):
+        """Values of the whole planning."""
+        raise NotImplementedError
+
+    def read_due(self, until_date=None, since_date=None):
+        """(header, rows, row_ids) covering every row with envoye=non dated
+        in [since_date, until_date] (YYYY-MM-DD, None = unbounded).
+
+        Backends may return more rows than that; callers still filter.
+        """
+        raise NotImplementedError
+
+    def iter_due(self, until_date=None, since_date=None, chunk_rows=None):
+        """Same rows as read_due, as a generator of (header, rows, row_ids)
+        chunks of at most `chunk_rows` rows, so the whole planning is never
+        held in memory at once.
+        """
+        header, rows, row_ids = self.read_due(until_date, since_date)
+        step = chunk_rows or len(rows) or 1
+        for i in range(0, len(rows), step):
+            yield header, rows[i:i + step], row_ids[i:i + step]
+
+    def write_planning(self, old_values, new_values, key_cols=KEY_COLS):
+        """Replace the planning `old_values` (as read) with `new_values`."""
+        raise NotImplementedError
+
+    def mark_sent(self, header, updates):
+        """Write [(row_id, value)] into the planning 'envoye' column."""
+        raise NotImplementedError
+
+    def planning_version(self):
+        """Opaque token that changes whenever the planning changes (None if unknown)."""
+        return None
+
+    def close(self):
+        pass
+
+# ========= Snapshot cache =========
+
+class SnapshotCache:
+    """On-disk copy of worksheet values, one JSON file per (spreadsheet, worksheet).
+
+    Each snapshot carries the fingerprint it was read under (the Drive
+    modifiedTime of the spreadsheet) and is only served while it still matches.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, doc, title):
+        name = hashlib.sha1(f"{doc}\0{title}".encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{name}.json")
+
+    def get(self, doc, title, fingerprint):
+        """Cached values, or None if missing or taken under another fingerprint."""
+        if fingerprint is None:
+            return None
+        try:
+            with open(self._path(doc, title), encoding="utf-8") as f:
+                snap = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if snap.get("fingerprint") != fingerprint:
+            return None
+        return snap.get("values")
+
+    def put(self, doc, title, fingerprint, values):
+        if fingerprint is None:
+            return
+        path = self._path(doc, title)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"doc": doc, "title": title, "fingerprint": fingerprint, "values": values}, f, ensure_ascii=False)
+        os.replace(tmp, path)  # never leave a half-written snapshot
+
+    def invalidate(self, doc, title):
+        try:
+            os.remove(self._path(doc, title))
+        except OSError:
+            pass
+
+# ========= Google Sheets =========
+
+class GSheetsStore(PlanningStore):
+    """The spreadsheets named in config.py, through gspread.
+
+    Reads go through the snapshot cache when SNAPSHOT_CACHE_DIR is set: a
+    spreadsheet whose modifiedTime hasn't moved is served from disk.
+    """
+
+    def __init__(self, client=None, cache_dir=SNAPSHOT_CACHE_DIR, session_file=SHEETS_SESSION_FILE):
+        # gspread / google-auth are imported here only: the SQLite backend and
+        # Script_Bot_Lite's idle runs don't pay for them
+        import gspread
+        from google.oauth2.service_account import Credentials
+        # token, spreadsheet ids and tab metadata reused across runs (sheets_session.py)
+        self.session = SheetsSession(session_file) if session_file else None
+        if client is None:
+            with metrics.timer("sheets.auth"):
+                if self.session is not None:
+                    client = self.session.client(config.CHEMIN_CLE_JSON)
+                else:
+                    scope = [
+                        "https://spreadsheets.google.com/feeds",
+                        "https://www.googleapis.com/auth/drive",
+                    ]
+                    creds = Credentials.from_service_account_file(config.CHEMIN_CLE_JSON, scopes=scope)
+                    client = gspread.authorize(creds)
+        self.client = client
+        self._docs = {}
+        self._sheets = {}
+        self.cache = SnapshotCache(cache_dir) if cache_dir else None
+
+    def doc(self, name):
+        if name not in self._docs:
+            with metrics.timer("sheets.open"):
+                if self.session is not None:
+                    self._docs[name] = self.session.open(self.client, name)
+                else:
+                    self._docs[name] = self.client.open(name)
+        return self._docs[name]
+
+    def worksheet(self, name, title):
+        if (name, title) not in self._sheets:
+            doc = self.doc(name)
+            with metrics.timer("sheets.open"):
+                if self.session is not None:
+                    self._sheets[(name, title)] = self.session.worksheet(doc, name, title)
+                else:
+                    self._sheets[(name, title)] = doc.worksheet(title)
+        return self._sheets[(name, title)]
+
+    def _forget_session(self, name):
+        # the tabs of `name` changed (or a write hit stale tab ids): next open re-fetches them
+        if self.session is not None:
+            self.session.forget(name)
+
+    @property
+    def ws_clients(self):
+        return self.worksheet(config.FICHIER_CLIENTS, config.FEUILLE_CLIENTS)
+
+    @property
+    def ws_planning(self):
+        return self.worksheet(config.FICHIER_PLANNING, config.FEUILLE_PLANNING)
+
+    def fingerprint(self, name):
+        """Drive modifiedTime of spreadsheet `name` (None if unavailable)."""
+        try:
+            doc = self.doc(name)
+            with metrics.timer("drive.modified_time"):
+                return doc.get_lastUpdateTime()
+        except Exception:
+            return None
+
+    def _cached_read(self, name, title, read, metric):
+        fp = self.fingerprint(name) if self.cache is not None else None
+        values = self.cache.get(name, title, fp) if self.cache is not None else None
+        if values is not None:
+            metrics.incr("sheets.cache_hit")
+            return values
+        if self.cache is not None:
+            metrics.incr("sheets.cache_miss")
+        with metrics.timer(metric):
+            values = read()
+        metrics.incr("sheets.bytes_in", metrics.json_size(values))
+        if self.cache is not None:
+            self.cache.put(name, title, fp, values)
+        return values
+
+    def _invalidate(self, name, title):
+        # after our own writes: the next read must go back to Sheets
+        if self.cache is not None:
+            self.cache.invalidate(name, title)
+
+    def read_clients(self):
+        return self._cached_read(config.FICHIER_CLIENTS, config.FEUILLE_CLIENTS,
+                                 lambda: self.ws_clients.get_all_values(), "sheets.read_clients")
+
+    @metrics.timed("sheets.write_clients")
+    def write_client_column(self, column, updates):
+        ws_clients = self.ws_clients
+        # 1) S'assurer que la colonne existe
+        header = ws_clients.row_values(1)
+        if column not in header:
+            all_vals = ws_clients.get_all_values()
+            header.append(column)
+            if all_vals:
+                ws_clients.update("A1", [header] + all_vals[1:])
+            else:
+                ws_clients.update("A1", [header])
+            self._invalidate(config.FICHIER_CLIENTS, config.FEUILLE_CLIENTS)
+            header = ws_clients.row_values(1)
+        col_idx = header.index(column) + 1  # index 1-based
+
+        # 2) Batch update (contiguous rows merged into one range)
+        if updates:
+            writeback.write_column(ws_clients.spreadsheet, config.FEUILLE_CLIENTS, col_idx, updates)
+            self._invalidate(config.FICHIER_CLIENTS, config.FEUILLE_CLIENTS)
+
+    def programme_titles(self):
+        return [ws.title for ws in self.doc(config.FICHIER_PROGRAMMES).worksheets()]
+
+    def read_programme_tabs(self, titles):
+        # One values_batch_get for every tab; titles missing from the spreadsheet
+        # are left out (one missing range would fail the whole batch)
+        name = config.FICHIER_PROGRAMMES
+        doc = self.doc(name)
+        fp = self.fingerprint(name) if self.cache is not None else None
+        # the list of tab titles is cached too, under the empty title
+        existing = self.cache.get(name, "", fp) if self.cache is not None else None
+        if existing is None:
+            existing = self.programme_titles()
+            if self.cache is not None:
+                self.cache.put(name, "", fp, existing)
+        existing = set(existing)
+        wanted = [t for t in dict.fromkeys(titles) if t in existing]
+
+        tabs, missing = {}, []
+        for t in wanted:
+            values = self.cache.get(name, t, fp) if self.cache is not None else None
+            if values is None:
+                missing.append(t)
+            else:
+                tabs[t] = values
+        if self.cache is not None:
+            metrics.incr("sheets.cache_hit", len(tabs))
+            metrics.incr("sheets.cache_miss", len(missing))
+        if missing:
+            with metrics.timer("sheets.read_programmes"):
+                resp = doc.values_batch_get([_quote(t) for t in missing])
+            for t, vr in zip(missing, resp.get("valueRanges", [])):
+                tabs[t] = vr.get("values", [])
+                metrics.incr("sheets.bytes_in", metrics.json_size(tabs[t]))
+                if self.cache is not None:
+                    self.cache.put(name, t, fp, tabs[t])
+        return {t: tabs[t] for t in wanted if t in tabs}
+
+    def read_planning(self):
+        return self._cached_read(config.FICHIER_PLANNING, config.FEUILLE_PLANNING,
+                                 lambda: self.ws_planning.get_all_values(), "sheets.read_planning")
+
+    def read_due(self, until_date=None, since_date=None):
+        if PLANNING_DUE_READ == "window" and until_date is not None:
+            due = self._read_due_window(str(until_date), str(since_date) if since_date else None)
+            if due is not None:
+                return due
+        rows = self.read_planning()
+        if not rows:
+            return [], [], []
+        return rows[0], rows[1:], list(range(2, len(rows) + 1))
+
+    def iter_due(self, until_date=None, since_date=None, chunk_rows=None):
+        """Read the planning in row ranges of `chunk_rows` rows, keeping only
+        the envoye=non rows of each range (date filtering is left to callers).
+
+        Bypasses the snapshot cache and the index: every row is fetched, but
+        only one range is held at a time. Ranges are read up to the sheet's
+        row count, so blank rows in the middle don't end the read.
+        """
+        if not chunk_rows:
+            yield from super().iter_due(until_date, since_date)
+            return
+        doc = self.doc(config.FICHIER_PLANNING)
+        title = _quote(config.FEUILLE_PLANNING)
+        with metrics.timer("sheets.read_chunk"):
+            resp = doc.values_batch_get([f"{title}!1:1"])
+        header_vals = resp["valueRanges"][0].get("values", [])
+        header = header_vals[0] if header_vals else []
+        if not header:
+            return
+        width = len(header)
+        last_col = col_idx_to_a1(width)
+        e = header.index("envoye") if "envoye" in header else None
+        # grid size read fresh: the cached tab properties predate rows added since
+        meta = doc.fetch_sheet_metadata({"fields": "sheets.properties(title,gridProperties.rowCount)"})
+        row_count = next((s["properties"]["gridProperties"]["rowCount"] for s in meta.get("sheets", [])
+                          if s["properties"]["title"] == config.FEUILLE_PLANNING), 0)
+        for start in range(2, row_count + 1, chunk_rows):
+            with metrics.timer("sheets.read_chunk"):
+                resp = doc.values_batch_get([f"{title}!A{start}:{last_col}{start + chunk_rows - 1}"])
+            block = resp["valueRanges"][0].get("values", [])
+            metrics.incr("sheets.bytes_in", metrics.json_size(block))
+            rows, row_ids = [], []
+            for r, row in enumerate(block, start=start):
+                if e is not None and not (e < len(row) and str(row[e]).lower() == "non"):
+                    continue
+                rows.append(row + [""] * (width - len(row)))
+                row_ids.append(r)
+            yield header, rows, row_ids
+
+    @metrics.timed("sheets.read_due_window")
+    def _read_due_window(self, until, since):
+        """Fetch only the planning rows dated in [since, until] using the index tab.
+
+        The block is read with one row of margin on each side plus the row
+        after the table; if any of them shows the sheet no longer matches the
+        index (manual edits), returns None and the caller reads everything.
+        """
+        doc = self.doc(config.FICHIER_PLANNING)
+        title = _quote(config.FEUILLE_PLANNING)
+        try:
+            resp = doc.values_batch_get([_quote(PLANNING_INDEX_SHEET), f"{title}!1:1"])
+            index_vals, header_vals = [vr.get("values", []) for vr in resp.get("valueRanges", [])]
+        except Exception:
+            return None  # pas encore d'index
+        header = header_vals[0] if header_vals else []
+        index = _parse_date_index(index_vals)
+        if index is None or "date" not in header:
+            return None
+        end, spans = index
+        width = len(header)
+        last_col = col_idx_to_a1(width)
+        p = header.index("date")
+
+        in_range = [fl for d, fl in spans.items() if d <= until and (since is None or d >= since)]
+        probe = f"{title}!A{end + 1}:{last_col}{end + 1}"
+        if not in_range:
+            resp = doc.values_batch_get([probe])
+            return (header, [], []) if not resp["valueRanges"][0].get("values") else None
+
+        first = 2 if since is None else min(f for f, _ in in_range)
+        last = max(l for _, l in in_range)
+        lo, hi = max(2, first - 1), last + 1
+        resp = doc.values_batch_get([f"{title}!A{lo}:{last_col}{hi}", probe])
+        block_vals, probe_vals = [vr.get("values", []) for vr in resp["valueRanges"]]
+        metrics.incr("sheets.bytes_in", metrics.json_size(block_vals))
+        if probe_vals:
+            return None  # lignes ajoutées après la fin indexée
+        block = [r + [""] * (width - len(r)) for r in block_vals]
+        block += [[""] * width] * (hi - lo + 1 - len(block))
+        date_at = lambda r: str(block[r - lo][p]).strip()
+
+        if any(not (date_at(r) <= until and (since is None or date_at(r) >= since)) for r in range(first, last + 1)):
+            return None
+        if lo < first and date_at(lo) >= since:
+            return None
+        if hi <= end and date_at(hi) and date_at(hi) <= until:
+            return None
+        return header, block[first - lo:last - lo + 1], list(range(first, last + 1))
+
+    def _write_index(self, values):
+        import gspread
+        try:
+            ws = self.worksheet(config.FICHIER_PLANNING, PLANNING_INDEX_SHEET)
+        except gspread.exceptions.WorksheetNotFound:
+            ws = self.doc(config.FICHIER_PLANNING).add_worksheet(title=PLANNING_INDEX_SHEET, rows=100, cols=3)
+            self._forget_session(config.FICHIER_PLANNING)
+            try:
+                ws.hide()
+            except Exception:
+                pass
+        # Only when it changed: an unchanged planning keeps its Drive modifiedTime
+        # (bot snapshots, daemon refresh). One update, blank rows over the old tail.
+        rows = [[str(c) for c in r] + [""] * (3 - len(r)) for r in _date_index(values)]
+        current = _trimmed(ws.get_all_values())
+        if current == _trimmed(rows):
+            return
+        ws.update(rows + [["", "", ""]] * (len(current) - len(rows)), "A1")
+
+    @metrics.timed("sheets.write_planning")
+    def write_planning(self, old_values, new_values, key_cols=KEY_COLS):
+        """Write the merged planning without ever leaving the sheet empty."""
+        ws_planning = self.ws_planning
+        self._invalidate(config.FICHIER_PLANNING, config.FEUILLE_PLANNING)
+        if PLANNING_WRITE_MODE == "diff":
+            requests = _diff_requests(ws_planning.id, old_values, new_values, key_cols)
+            if requests is not None:
+                if requests:
+                    try:
+                        ws_planning.spreadsheet.batch_update({"requests": requests})
+                    except Exception:
+                        self._forget_session(config.FICHIER_PLANNING)  # ids d'onglet peut-être périmés
+                        raise
+                    metrics.incr("sheets.bytes_out", metrics.json_size(requests))
+                self._write_index(new_values)
+                print(f"[DEBUG] Écriture diff : {len(requests)} requête(s)")
+                return
+        # Full rewrite in one update: the new table padded with blanks up to the old
+        # table's size, so readers never see new rows next to stale old ones
+        old_w = max((len(r) for r in old_values), default=0)
+        width = max(old_w, len(new_values[0]) if new_values else 0)
+        padded = [list(r) + [""] * (width - len(r)) for r in new_values]
+        padded += [[""] * width for _ in range(len(old_values) - len(new_values))]
+        if padded:
+            ws_planning.update(padded, "A1")
+            metrics.incr("sheets.bytes_out", metrics.json_size(padded))
+        self._write_index(new_values)
+
+    @metrics.timed("sheets.mark_sent")
+    def mark_sent(self, header, updates):
+        # Column indices (1-based) for A1 ranges
+        col_map = {name: (i+1) for i, name in enumerate(header)}
+        if "envoye" not in col_map:
+            raise RuntimeError("Colonne 'envoye' absente de la feuille planning.")
+
+        # Batch update only changed 'envoye' cells, contiguous rows merged into one range
+        if updates:
+            writeback.write_column(self.ws_planning.spreadsheet, config.FEUILLE_PLANNING, col_map["envoye"], updates)
+            self._invalidate(config.FICHIER_PLANNING, config.FEUILLE_PLANNING)
+
+    def planning_version(self):
+        return self.fingerprint(config.FICHIER_PLANNING)
+
+# ========= SQLite =========
+
+class SQLiteStore(PlanningStore):
+    """Local SQLite copy: planning in an indexed table, other tabs as raw rows.
+
+    The (lower(envoye), date, heure) index lets the bot read only the pending rows.
+    Planning row ids follow the sheet numbering (first data row = 2).
+    """
+
+    def __init__(self, path=None):
+        self.path = path or SQLITE_STORE
+        self.db = sqlite3.connect(self.path, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(f"""
+            CREATE TABLE IF NOT EXISTS tabs (
+                file TEXT NOT NULL, title TEXT NOT NULL, row INTEGER NOT NULL, cells TEXT NOT NULL,
+                PRIMARY KEY (file, title, row)
+            );
+            CREATE TABLE IF NOT EXISTS planning (
+                row INTEGER PRIMARY KEY,
+                {", ".join(f"{c} TEXT NOT NULL DEFAULT ''" for c in PLANNING_COLS)}
+            );
+            DROP INDEX IF EXISTS planning_due;
+            CREATE INDEX IF NOT EXISTS planning_due_ci ON planning (lower(envoye), date, heure);
+            CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT);
+        """)
+
+    def close(self):
+        self.db.close()
+
+    # --- generic tabs (Clients, programmes, Types) ---
+
+    def read_tab(self, file, title):
+        cur = self.db.execute("SELECT cells FROM tabs WHERE file = ? AND title = ? ORDER BY row", (file, title))
+        return [json.loads(c) for (c,) in cur]
+
+    def write_tab(self, file, title, values):
+        self.db.execute("BEGIN")
+        self.db.execute("DELETE FROM tabs WHERE file = ? AND title = ?", (file, title))
+        self.db.executemany(
+            "INSERT INTO tabs (file, title, row, cells) VALUES (?, ?, ?, ?)",
+            [(file, title, i + 1, json.dumps([str(v) for v in r], ensure_ascii=False)) for i, r in enumerate(values)],
+        )
+        self.db.execute("COMMIT")
+
+    def read_clients(self):
+        return self.read_tab(config.FICHIER_CLIENTS, config.FEUILLE_CLIENTS)
+
+    def write_client_column(self, column, updates):
+        values = self.read_clients() or [[]]
+        header = values[0]
+        if column not in header:
+            header.append(column)
+        idx = header.index(column)
+        for r, val in updates:
+            while len(values) < r:
+                values.append([])
+            row = values[r - 1]
+            row.extend([""] * (idx + 1 - len(row)))
+            row[idx] = val
+        self.write_tab(config.FICHIER_CLIENTS, config.FEUILLE_CLIENTS, values)
+
+    def programme_titles(self):
+        cur = self.db.execute("SELECT DISTINCT title FROM tabs WHERE file = ?", (config.FICHIER_PROGRAMMES,))
+        return [t for (t,) in cur]
+
+    def read_programme_tabs(self, titles):
+        existing = set(self.programme_titles())
+        return {t: self.read_tab(config.FICHIER_PROGRAMMES, t) for t in dict.fromkeys(titles) if t in existing}
+
+    # --- planning ---
+
+    def read_planning(self):
+        cur = self.db.execute(f"SELECT {', '.join(PLANNING_COLS)} FROM planning ORDER BY row")
+        rows = [list(r) for r in cur]
+        return [list(PLANNING_COLS)] + rows if rows else []
+
+    def _due_query(self, until_date, since_date):
+        # case-insensitive like the Sheets path ("Non" is pending too), still on the index
+        sql = f"SELECT row, {', '.join(PLANNING_COLS)} FROM planning WHERE lower(envoye) = 'non'"
+        args = []
+        if until_date is not None:
+            sql += " AND date <= ?"
+            args.append(str(until_date))
+        if since_date is not None:
+            sql += " AND date >= ?"
+            args.append(str(since_date))
+        return sql + " ORDER BY row", args
+
+    def read_due(self, until_date=None, since_date=None):
+        rows = self.db.execute(*self._due_query(until_date, since_date)).fetchall()
+        return list(PLANNING_COLS), [list(r[1:]) for r in rows], [r[0] for r in rows]
+
+    def iter_due(self, until_date=None, since_date=None, chunk_rows=None):
+        sql, args = self._due_query(until_date, since_date)
+        cur = self.db.execute(sql, args)
+        while True:
+            rows = cur.fetchmany(chunk_rows or 10000)
+            if not rows:
+                return
+            yield list(PLANNING_COLS), [list(r[1:]) for r in rows], [r[0] for r in rows]
+
+    def write_planning(self, old_values, new_values, key_cols=KEY_COLS):
+        # One transaction: readers see either the old or the new planning, never an empty one
+        header = new_values[0] if new_values else []
+        pos = [header.index(c) if c in header else None for c in PLANNING_COLS]
+        rows = [
+            (i + 2, *[("" if p is None or p >= len(r) else str(r[p])) for p in pos])
+            for i, r in enumerate(new_values[1:])
+        ]
+        self.db.execute("BEGIN")
+        self.db.execute("DELETE FROM planning")
+        self.db.executemany(
+            f"INSERT INTO planning (row, {', '.join(PLANNING_COLS)}) VALUES ({', '.join('?' * (len(PLANNING_COLS) + 1))})",
+            rows,
+        )
+        self._bump_version()
+        self.db.execute("COMMIT")
+
+    def mark_sent(self, header, updates):
+        if not updates:
+            return
+        self.db.execute("BEGIN")
+        self.db.executemany("UPDATE planning SET envoye = ? WHERE row = ?", [(v, r) for r, v in updates])
+        self._bump_version()
+        self.db.execute("COMMIT")
+
+    def planning_version(self):
+        row = self.db.execute("SELECT v FROM meta WHERE k = 'planning_version'").fetchone()
+        return row[0] if row else None
+
+    def _bump_version(self):
+        self.db.execute(
+            "INSERT INTO meta (k, v) VALUES ('planning_version', '1') "
+            "ON CONFLICT(k) DO UPDATE SET v = CAST(v AS INTEGER) + 1"
+        )
+
+# ========= Factory / sync =========
+
+def open_store(backend=None):
+    backend = (backend or STORAGE_BACKEND or "gsheets").lower()
+    if backend == "sqlite":
+        return SQLiteStore(SQLITE_STORE)
+    if backend == "gsheets":
+        return GSheetsStore()
+    raise ValueError(f"STORAGE_BACKEND inconnu : {backend}")
+
+def sync_from_sheets(local, sheets):
+    """Copy Clients, every programme tab and the planning from Sheets into `local`."""
+    local.write_tab(config.FICHIER_CLIENTS, config.FEUILLE_CLIENTS, sheets.read_clients())
+    titles = sheets.programme_titles()
+    for title, values in sheets.read_programme_tabs(titles).items():
+        local.write_tab(config.FICHIER_PROGRAMMES, title, values)
+    local.write_planning(local.read_planning(), sheets.read_planning())
+    print(f"🔄 Copie Sheets -> {local.path} : clients + {len(titles)} onglet(s) programme + planning")
+
+def push_planning_to_sheets(local, sheets):
+    """Publish the local planning (with its envoye marks) back to the Planning sheet."""
+    sheets.write_planning(sheets.read_planning(), local.read_planning())
+    print(f"📤 Planning {local.path} -> Sheets")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synchronisation Google Sheets <-> stockage SQLite local.")
+    parser.add_argument("action", choices=["sync", "push-planning"],
+                        help="sync : Sheets -> SQLite ; push-planning : planning SQLite -> Sheets")
+    args = parser.parse_args()
+    local, sheets = SQLiteStore(SQLITE_STORE), GSheetsStore()
+    try:
+        if args.action == "sync":
+            sync_from_sheets(local, sheets)
+        else:
+            push_planning_to_sheets(local, sheets)
+    finally:
+        local.close()
@@ -0,0 +1,327 @@
+import random
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import quote_plus, urlencode
+import requests
+from requests.adapters import HTTPAdapter
+import metrics
+
+# ======================
+# Rate limiting
+# ======================
+
+class _TokenBucket:
+    # GCRA form of a token bucket: `tat` is the theoretical arrival time of the next message
+    def __init__(self, rate_per_s, burst=1):
+        self.interval = 1.0 / float(rate_per_s)
+        self.tolerance = (max(1, int(burst)) - 1) * self.interval
+        self.tat = 0.0
+
+    def earliest(self, now):
+        return max(now, self.tat - self.tolerance)
+
+    def reserve(self, t):
+        self.tat = max(self.tat, t) + self.interval
+
+    def penalize(self, until):
+        self.tat = max(self.tat, until + self.tolerance)
+
+class RateLimiter:
+    """Paces sends ahead of time: one global bucket plus one bucket per chat_id.
+
+    Negative chat ids (groups / channels) get the slower per-minute group bucket.
+    Thread-safe, so it can be shared by the async send pool.
+    """
+
+    def __init__(self, global_rate=30, per_chat_rate=1, per_group_per_min=20):
+        self._lock = threading.Lock()
+        self._global = _TokenBucket(global_rate, burst=global_rate)
+        self._per_chat_rate = per_chat_rate
+        self._per_group_rate = per_group_per_min / 60.0
+        self._chats = {}
+
+    def _bucket(self, chat_id):
+        key = str(chat_id).strip()
+        b = self._chats.get(key)
+        if b is None:
+            rate = self._per_group_rate if key.startswith("-") else self._per_chat_rate
+            b = self._chats[key] = _TokenBucket(rate)
+        return b
+
+    def acquire(self, chat_id):
+        """Block until chat_id may send; returns the seconds spent waiting."""
+        with self._lock:
+            now = time.monotonic()
+            chat = self._bucket(chat_id)
+            t = max(self._global.earliest(now), chat.earliest(now))
+            self._global.reserve(t)
+            chat.reserve(t)
+        wait = t - now
+        if wait > 0:
+            time.sleep(wait)
+        return max(0.0, wait)
+
+    def penalize(self, chat_id, seconds):
+        # Telegram answered 429: hold this chat back for retry_after
+        with self._lock:
+            self._bucket(chat_id).penalize(time.monotonic() + seconds)
+
+# ======================
+# Media cache
+# ======================
+
+UTC_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+def _utc_str(epoch):
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime(UTC_FORMAT)
+
+def _utc_epoch(s):
+    try:
+        return datetime.strptime(s, UTC_FORMAT).replace(tzinfo=timezone.utc).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+class FileIdCache:
+    """Persistent photo URL -> Telegram file_id map (SQLite).
+
+    Once a URL went through sendPhoto, Telegram keeps the file: later sends
+    pass its file_id instead of making Telegram download the image again.
+    Entries older than `ttl` seconds are ignored, so an image replaced
+    behind the same URL is fetched again (and re-cached) at most `ttl` later.
+    The database is opened (and created) on first use, i.e. the first photo.
+    """
+
+    def __init__(self, path, ttl=None):
+        self.path = path
+        self.ttl = ttl  # secondes ; None = jamais périmé
+        self._lock = threading.Lock()
+        self._mem = {}  # url -> (file_id, updated_at epoch)
+        self._db = None
+
+    def _open(self):
+        # lock held by the caller
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS file_ids (
+                    url TEXT PRIMARY KEY,
+                    file_id TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )""")
+            if self.ttl is not None:
+                self._db.execute("DELETE FROM file_ids WHERE updated_at < ?", (_utc_str(time.time() - self.ttl),))
+            for url, file_id, updated_at in self._db.execute("SELECT url, file_id, updated_at FROM file_ids"):
+                self._mem[url] = (file_id, _utc_epoch(updated_at))
+        return self._db
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def get(self, url):
+        with self._lock:
+            self._open()
+            file_id, updated = self._mem.get(url, (None, 0.0))
+        if file_id is not None and self.ttl is not None and time.time() - updated > self.ttl:
+            return None
+        return file_id
+
+    def put(self, url, file_id):
+        now = time.time()
+        with self._lock:
+            self._open().execute("INSERT OR REPLACE INTO file_ids (url, file_id, updated_at) VALUES (?, ?, ?)",
+                                 (url, file_id, _utc_str(now)))
+            self._mem[url] = (file_id, now)
+
+    def drop(self, url):
+        with self._lock:
+            self._open().execute("DELETE FROM file_ids WHERE url = ?", (url,))
+            self._mem.pop(url, None)
+
+# 400 descriptions meaning the file_id itself was refused (expired, other bot...)
+FILE_ID_ERRORS = ("wrong file identifier", "wrong remote file identifier", "file reference")
+
+def _file_id_refused(err):
+    desc = err.lower().replace("_", " ")
+    return err.startswith("400:") and any(e in desc for e in FILE_ID_ERRORS)
+
+def _photo_file_id(data):
+    # sendPhoto returns every generated size; the last one is the original resolution
+    try:
+        return data["result"]["photo"][-1]["file_id"]
+    except (KeyError, IndexError, TypeError):
+        return None
+
+# ======================
+# Client
+# ======================
+
+FORM_HEADERS = {"Content-Type": "application/x-www-form-urlencoded"}
+
+class PreparedRequest:
+    """A Bot API call with its form body encoded once, sendable to many chats.
+
+    `fallback` is the same call by URL, used when a cached photo file_id is refused.
+    """
+    __slots__ = ("method", "body", "photo_url", "fallback")
+
+    def __init__(self, method, payload, photo_url=None, fallback=None):
+        self.method = method
+        self.body = urlencode(payload).encode("utf-8")   # everything but chat_id
+        self.photo_url = photo_url
+        self.fallback = fallback
+
+class TelegramClient:
+    """Bot API client keeping one keep-alive connection pool for the whole run.
+
+    Thread-safe: the async send pool shares a single instance.
+    """
+
+    def __init__(self, token, timeout=10, max_retries=3, pool_size=10,
+                 backoff_base=1.0, backoff_max=30.0, limiter=None, api_base=None, file_ids=None):
+        self.api_base = api_base or f"https://api.telegram.org/bot{token}"
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.limiter = limiter
+        self.file_ids = file_ids  # FileIdCache or None
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, int(pool_size)))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # Time accounting: pacing (throttle) vs sleeping after errors (retry)
+        self._stats_lock = threading.Lock()
+        self.stats = {"throttle_s": 0.0, "retry_s": 0.0, "http_429": 0}
+
+    def close(self):
+        self.session.close()
+        if self.file_ids is not None:
+            self.file_ids.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def send_message(self, chat_id, text):
+        return self.send_prepared(self.prepare_message(text), chat_id)
+
+    def prepare_message(self, text):
+        return PreparedRequest("sendMessage", {"text": text, "disable_web_page_preview": False})
+
+    def prepare_photo(self, photo_url, caption=None):
+        """sendPhoto for many chats: by cached file_id when known, else by URL."""
+        payload = {"photo": photo_url}
+        if caption:
+            payload["caption"] = caption
+        by_url = PreparedRequest("sendPhoto", payload, photo_url=photo_url)
+        cached = self.file_ids.get(photo_url) if self.file_ids is not None else None
+        if not cached:
+            return by_url
+        return PreparedRequest("sendPhoto", {**payload, "photo": cached}, photo_url=photo_url, fallback=by_url)
+
+    def send_prepared(self, prepared, chat_id):
+        body = b"chat_id=" + quote_plus(str(chat_id)).encode("ascii") + b"&" + prepared.body
+        ok, err, data = self._call(prepared.method, {"chat_id": chat_id}, body=body)
+        if prepared.fallback is not None:
+            # sent by cached file_id
+            if ok:
+                metrics.incr("telegram.file_id_hit")
+            elif _file_id_refused(err):
+                # forget the file_id and send the URL again; other 400s (chat not found,
+                # caption too long...) would fail by URL too and say nothing about the file
+                self.file_ids.drop(prepared.photo_url)
+                return self.send_prepared(prepared.fallback, chat_id)
+        elif ok and prepared.photo_url and self.file_ids is not None:
+            file_id = _photo_file_id(data)
+            if file_id:
+                self.file_ids.put(prepared.photo_url, file_id)
+        return ok, err
+
+    def send_photo(self, chat_id, photo_url, caption=None):
+        return self.send_prepared(self.prepare_photo(photo_url, caption), chat_id)
+
+    def _stat_add(self, key, value):
+        with self._stats_lock:
+            self.stats[key] += value
+        metrics.incr(f"telegram.{key}", value)
+
+    def _retry_sleep(self, seconds):
+        self._stat_add("retry_s", seconds)
+        time.sleep(seconds)
+
+    def _backoff(self, attempt):
+        # Exponential backoff with jitter so parallel workers don't retry in lockstep
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _call(self, method, payload, body=None):
+        """POST with retries for 429 / 5xx; returns (success, err, data).
+
+        `body` (pre-encoded form) is sent instead of `payload`, which then only
+        needs the chat_id for rate limiting.
+        """
+        url = f"{self.api_base}/{method}"
+        chat_id = payload.get("chat_id")
+        data = {}
+        for attempt in range(1, self.max_retries + 1):
+            if self.limiter is not None:
+                self._stat_add("throttle_s", self.limiter.acquire(chat_id))
+            t0 = time.perf_counter()
+            try:
+                if body is not None:
+                    r = self.session.post(url, data=body, headers=FORM_HEADERS, timeout=self.timeout)
+                else:
+                    r = self.session.post(url, data=payload, timeout=self.timeout)
+            except requests.RequestException as e:
+                metrics.observe(f"telegram.{method}", time.perf_counter() - t0)
+                metrics.incr("telegram.request_errors")
+                if attempt >= self.max_retries:
+                    return False, f"request_exception:{e}", {}
+                metrics.incr("telegram.retries")
+                self._retry_sleep(self._backoff(attempt))
+                continue
+            metrics.observe(f"telegram.{method}", time.perf_counter() - t0)
+            metrics.incr("telegram.bytes_out", len(r.request.body or ""))
+            metrics.incr("telegram.bytes_in", len(r.content))
+
+            try:
+                data = r.json()
+            except Exception:
+                data = {"ok": False, "error_code": r.status_code, "description": "invalid_json"}
+
+            if r.status_code == 429:
+                retry_after = 1
+                try:
+                    retry_after = int(data.get("parameters", {}).get("retry_after", 1))
+                except Exception:
+                    pass
+                self._stat_add("http_429", 1)
+                if self.limiter is not None:
+                    self.limiter.penalize(chat_id, retry_after + 1)
+                metrics.incr("telegram.retries")
+                self._retry_sleep(retry_after + 1)
+                continue
+
+            if r.status_code >= 500 and attempt < self.max_retries:
+                metrics.incr("telegram.http_5xx")
+                metrics.incr("telegram.retries")
+                self._retry_sleep(self._backoff(attempt))
+                continue
+
+            if r.ok and data.get("ok", False):
+                return True, "ok", data
+
+            # Other client errors: no retry
+            return False, f"{data.get('error_code','?')}:{data.get('description','unknown')}", data
+
+        return False, "max_retries_exceeded", data
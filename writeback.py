@@ -0,0 +1,92 @@
+import random
+import time
+import config
+import metrics
+
+# ========= Parameters =========
+
+GSHEETS_MAX_RETRIES = getattr(config, "GSHEETS_MAX_RETRIES", 5)
+GSHEETS_RETRY_BASE = getattr(config, "GSHEETS_RETRY_BASE", 1.5)          # secondes, base^n + jitter
+WRITEBACK_MAX_CELLS = getattr(config, "WRITEBACK_MAX_CELLS", 10000)      # cellules max par values_batch_update
+
+# ========= Coalescing =========
+
+def coalesce(updates, max_rows=None):
+    """[(row, value)] -> [(first_row, [values])] runs of consecutive rows.
+
+    Rows are sorted; when a row appears twice, the last value wins. Runs are
+    cut every `max_rows` rows.
+    """
+    by_row = {}
+    for r, v in updates:
+        by_row[int(r)] = v
+    runs = []
+    for r in sorted(by_row):
+        if runs and runs[-1][0] + len(runs[-1][1]) == r and (not max_rows or len(runs[-1][1]) < max_rows):
+            runs[-1][1].append(by_row[r])
+        else:
+            runs.append((r, [by_row[r]]))
+    return runs
+
+def column_ranges(sheet_title, col_idx, updates, max_rows=None):
+    """values_batch_update `data` entries writing [(row, value)] into column `col_idx` (1-based)."""
+    import gspread
+    data = []
+    for first, values in coalesce(updates, max_rows):
+        a1 = f"{gspread.utils.rowcol_to_a1(first, col_idx)}:{gspread.utils.rowcol_to_a1(first + len(values) - 1, col_idx)}"
+        data.append({"range": gspread.utils.absolute_range_name(sheet_title, a1),
+                     "values": [[v] for v in values]})
+    return data
+
+# ========= Write with retries =========
+
+def _retryable(e):
+    # 429 = quota ; 5xx = erreur passagère côté Google
+    import gspread
+    code = getattr(getattr(e, "response", None), "status_code", None)
+    return isinstance(e, gspread.exceptions.APIError) and (code == 429 or (code or 0) >= 500)
+
+def with_retries(fn, *args, **kwargs):
+    """Call fn, retrying quota / server errors up to GSHEETS_MAX_RETRIES times."""
+    attempt = 0
+    while True:
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            attempt += 1
+            if not _retryable(e) or attempt > GSHEETS_MAX_RETRIES:
+                raise
+            wait = float(GSHEETS_RETRY_BASE) ** attempt + random.uniform(0, 1)
+            metrics.incr("sheets.retries")
+            metrics.observe("sheets.retry_wait", wait)
+            print(f"⏳ Quota Google Sheets, nouvel essai {attempt}/{GSHEETS_MAX_RETRIES} dans {wait:.1f}s")
+            time.sleep(wait)
+
+def write_ranges(spreadsheet, data, max_cells=None):
+    """values_batch_update `data` in requests of at most `max_cells` cells, each retried.
+
+    Returns the number of requests sent.
+    """
+    max_cells = max_cells or WRITEBACK_MAX_CELLS
+    chunks, size = [[]], 0
+    for d in data:
+        cells = sum(len(row) for row in d["values"])
+        if chunks[-1] and size + cells > max_cells:
+            chunks.append([])
+            size = 0
+        chunks[-1].append(d)
+        size += cells
+    sent = 0
+    for chunk in chunks:
+        if not chunk:
+            continue
+        body = {"valueInputOption": "RAW", "data": chunk}
+        with_retries(spreadsheet.values_batch_update, body)
+        metrics.incr("sheets.bytes_out", metrics.json_size(body))
+        sent += 1
+    return sent
+
+def write_column(spreadsheet, sheet_title, col_idx, updates, max_cells=None):
+    """Write [(row, value)] into one column: contiguous rows merged into one range."""
+    max_cells = max_cells or WRITEBACK_MAX_CELLS
+    return write_ranges(spreadsheet, column_ranges(sheet_title, col_idx, updates, max_cells), max_cells)